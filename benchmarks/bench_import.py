@@ -0,0 +1,195 @@
+import argparse
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+from mock_device42 import MockDevice42
+
+# Roughly what a CMDB load looks like: mostly devices, plus the objects they reference
+TYPE_MIX = ['Device'] * 7 + ['Building', 'Application', 'Customer']
+TARGETS = ('cli', 'web-import', 'web-compare')
+# Finer than the default buckets so the estimated percentiles are worth comparing between runs
+BENCH_BUCKETS = [round(0.0005 * 1.25 ** i, 6) for i in range(48)]
+
+
+def write_csv(path, csv_mappings, custom_fields, rows):
+    """Write `rows` generated rows covering every column in csv_mappings."""
+    columns = list(csv_mappings.values())
+    custom_columns = {csv_mappings[field] for fields in custom_fields.values() for field in fields
+                      if field in csv_mappings}
+    customers = max(1, rows // 100)
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(columns)
+        for i in range(rows):
+            object_type = TYPE_MIX[i % len(TYPE_MIX)]
+            values = {column: (f"{column} {i % 50}" if column in custom_columns else '') for column in columns}
+            values[csv_mappings['object_type']] = object_type
+            values[csv_mappings['name']] = f"{object_type}-{i}"
+            for field, value in (('latitude', f"{(i % 180) - 90}.5"), ('longitude', f"{(i % 360) - 180}.25"),
+                                 ('customer', f"Customer-{(i % customers) * len(TYPE_MIX) + 9}"),
+                                 ('type', 'physical')):
+                if field in csv_mappings and object_type == 'Device':
+                    values[csv_mappings[field]] = value
+            writer.writerow([values[column] for column in columns])
+
+
+def write_config(path, host, workers):
+    """Write a copy of the repo's config.yaml pointed at the mock server."""
+    with open(os.path.join(REPO_DIR, 'config.yaml'), 'r') as file:
+        config = yaml.safe_load(file)
+    config['host'] = host
+    config['ssl_verification'] = False
+    config.setdefault('import', {})['workers'] = workers
+    config['snapshot'] = {'path': None}
+    config['metrics'] = {'latency_buckets': BENCH_BUCKETS}
+    with open(path, 'w') as file:
+        yaml.safe_dump(config, file)
+
+
+def run_child(command, env=None):
+    """Run a command to completion and return (exit status, peak RSS in MB, wall seconds)."""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, cwd=REPO_DIR)
+    # wait4 gives the resource usage of this child alone, unlike RUSAGE_CHILDREN
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status) if hasattr(os, 'waitstatus_to_exitcode') else status
+    # ru_maxrss is in kilobytes on Linux
+    return process.returncode, usage.ru_maxrss / 1024, time.perf_counter() - started
+
+
+def web_child(target, csv_path, result_path):
+    """Drive one Flask upload route in this process and write its timing and metrics as JSON.
+
+    DEVICE42_CONFIG and DEVICE42_UPLOAD_FOLDER must be set before the web app is imported.
+    """
+    from device42_api import get_client
+
+    if target == 'web-import':
+        import webserver2 as webapp
+    else:
+        import webserver as webapp
+    client = webapp.app.test_client()
+
+    started = time.perf_counter()
+    with open(csv_path, 'rb') as csv_file:
+        response = client.post('/upload', data={'file': (csv_file, os.path.basename(csv_path))},
+                               content_type='multipart/form-data')
+    if target == 'web-import':
+        # The upload only queues the job; the import is done when the job is
+        job_url = response.location.rsplit('/', 1)[0]
+        while client.get(job_url).get_json()['status'] in ('queued', 'running'):
+            time.sleep(0.1)
+        status = client.get(job_url).get_json()['status']
+    else:
+        # The upload redirects to the first compare page; walk every page as a reviewer would
+        status = response.status_code
+        page = 0
+        more_pages = status == 302
+        while more_pages:
+            page += 1
+            page_response = client.get(response.location, query_string={'page': page})
+            status = page_response.status_code
+            more_pages = status == 200 and b'value="next"' in page_response.data
+    elapsed = time.perf_counter() - started
+
+    with open(result_path, 'w') as result_file:
+        json.dump({"status": status, "elapsed": elapsed,
+                   "metrics": get_client(webapp.CONFIG_FILE).metrics.to_dict()}, result_file)
+
+
+def run_target(target, rows, args, directory):
+    """Import or compare `rows` generated rows through one target and return a result dict."""
+    server = MockDevice42(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                          error_status=args.error_status, seed=args.seed).start()
+    try:
+        config_path = os.path.join(directory, f"config_{target}_{rows}.yaml")
+        csv_path = os.path.join(directory, f"rows_{rows}.csv")
+        result_path = os.path.join(directory, f"result_{target}_{rows}.json")
+        write_config(config_path, server.url, args.workers)
+        if not os.path.exists(csv_path):
+            with open(config_path, 'r') as file:
+                config = yaml.safe_load(file)
+            write_csv(csv_path, config['csv_mappings'], config.get('custom_fields', {}), rows)
+
+        if target == 'cli':
+            exit_status, peak_mb, elapsed = run_child(
+                [sys.executable, os.path.join(REPO_DIR, 'cli_import.py'), '-c', config_path, '-f', csv_path,
+                 '--journal', os.path.join(directory, f"journal_{rows}.sqlite3"), '--metrics-file', result_path])
+            with open(result_path, 'r') as result_file:
+                metrics = json.load(result_file)
+        else:
+            upload_folder = os.path.join(directory, f"uploads_{target}_{rows}")
+            env = dict(os.environ, DEVICE42_CONFIG=config_path, DEVICE42_UPLOAD_FOLDER=upload_folder)
+            exit_status, peak_mb, _ = run_child(
+                [sys.executable, os.path.abspath(__file__), '--web-child', target, csv_path, result_path], env=env)
+            with open(result_path, 'r') as result_file:
+                child_result = json.load(result_file)
+            elapsed = child_result['elapsed']
+            metrics = child_result['metrics']
+        return {
+            "target": target,
+            "rows": rows,
+            "exit_status": exit_status,
+            "seconds": elapsed,
+            "rows_per_second": rows / elapsed if elapsed else 0.0,
+            "requests": metrics['all_requests']['calls'],
+            "p50_ms": metrics['all_requests']['p50'] * 1000,
+            "p99_ms": metrics['all_requests']['p99'] * 1000,
+            "failed_rows": metrics['rows'].get('failed', 0),
+            "peak_mb": peak_mb,
+            "server_statuses": dict(server.statuses),
+        }
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--web-child':
+        web_child(*sys.argv[2:])
+        return
+
+    parser = argparse.ArgumentParser(
+        description="End-to-end import benchmark against a local mock Device42: throughput, latency, peak memory.")
+    parser.add_argument('-n', '--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='Row counts of the generated CSV files')
+    parser.add_argument('-t', '--targets', nargs='+', choices=TARGETS, default=list(TARGETS),
+                        help='cli_import.py, the webserver2 upload (import job), the webserver upload (compare)')
+    parser.add_argument('-w', '--workers', type=int, default=8, help='import.workers for the run')
+    parser.add_argument('--latency', type=float, default=0.002, help='Seconds the mock adds to every response')
+    parser.add_argument('--jitter', type=float, default=0.003, help='Up to this many extra seconds, at random')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of API calls the mock fails')
+    parser.add_argument('--error-status', type=int, default=503, help='Status code of injected errors')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the mock')
+    parser.add_argument('--json', type=str, default=None, help='Also write the results to this file')
+    args = parser.parse_args()
+
+    print(f"{'Target':<13}{'Rows':>8}{'Seconds':>9}{'Rows/s':>9}{'Requests':>10}{'p50 ms':>8}{'p99 ms':>8}"
+          f"{'Failed':>8}{'Peak MB':>9}")
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.sizes:
+            for target in args.targets:
+                result = run_target(target, rows, args, directory)
+                results.append(result)
+                note = "" if result['exit_status'] == 0 else f"  (exit status {result['exit_status']})"
+                print(f"{target:<13}{rows:>8}{result['seconds']:>9.1f}{result['rows_per_second']:>9.0f}"
+                      f"{result['requests']:>10}{result['p50_ms']:>8.1f}{result['p99_ms']:>8.1f}"
+                      f"{result['failed_rows']:>8}{result['peak_mb']:>9.0f}{note}", flush=True)
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+import argparse
+import csv
+import itertools
+import os
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from compact_rows import CompactReader
+from row_mapping import MappingPlan
+
+OBJECT_TYPES = ['Device', 'Building', 'Application', 'Customer']
+
+
+def write_synthetic_csv(path, csv_mappings, rows):
+    """Write `rows` rows using every column in csv_mappings."""
+    columns = list(csv_mappings.values())
+    with open(path, 'w', newline='') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(columns)
+        for i in range(rows):
+            values = {column: f"{column}-{i % 1000}" for column in columns}
+            values[csv_mappings['object_type']] = OBJECT_TYPES[i % len(OBJECT_TYPES)]
+            values[csv_mappings['name']] = f"object-{i}"
+            writer.writerow([values[column] for column in columns])
+
+
+def map_per_row(csv_mappings, row):
+    """The mapping loop process_row used before the plan: every mapping checked for every row."""
+    device = {}
+    for api_field, csv_column in csv_mappings.items():
+        if csv_column in row and api_field != 'object_type':
+            device[api_field] = row[csv_column]
+    return device
+
+
+def prepare_per_row(config, base_url, row):
+    """Everything process_row and bulk_import built per row before the plan, short of sending it."""
+    csv_mappings = config['csv_mappings']
+    object_type = row.get(csv_mappings['object_type'])
+    endpoints = {
+        "Device": f"{base_url}/devices/",
+        "Building": f"{base_url}/buildings/",
+        "Application": f"{base_url}/appcomps/",
+        "Customer": f"{base_url}/customers/",
+    }
+    endpoint = endpoints.get(object_type, None)
+    device = map_per_row(csv_mappings, row)
+    standard_fields = {field: value for field, value in device.items() if field in csv_mappings.keys()}
+    custom_fields_for_type = config.get('custom_fields', {}).get(object_type.lower(), {})
+    fields = {csv_field: device[csv_field] for csv_field in custom_fields_for_type if device.get(csv_field)}
+    payloads = []
+    for key, value in fields.items():
+        custom_field_data = {
+            "Device": {"device_id": 1, "key": key, "value": value},
+            "Building": {"id": 1, "key": key, "value": value},
+            "Application": {"id": 1, "key": key, "value": value},
+            "Customer": {"id": 1, "key": key, "value": value},
+        }
+        payloads.append(custom_field_data.get(object_type, {}))
+    return endpoint, standard_fields, payloads
+
+
+def prepare_with_plan(plan, row):
+    """The same payloads built from the compiled MappingPlan, as process_row and bulk_import now do."""
+    type_plan = plan.for_type(row.get(plan.type_column))
+    device = plan.map_row(row)
+    standard_fields = device
+    if not standard_fields.keys() <= plan.api_fields:
+        standard_fields = {field: value for field, value in device.items() if field in plan.api_fields}
+    fields = type_plan.custom_field_values(device)
+    payloads = [type_plan.custom_field_payload(1, key, value) for key, value in fields.items()]
+    return type_plan.endpoint, standard_fields, payloads
+
+
+def time_mapping(path, map_row, chunk_size, reader_class=csv.DictReader):
+    """Return (rows, seconds) spent mapping rows, excluding CSV parsing."""
+    rows = 0
+    elapsed = 0.0
+    with open(path, 'r') as csv_file:
+        reader = reader_class(csv_file)
+        while True:
+            chunk = list(itertools.islice(reader, chunk_size))
+            if not chunk:
+                break
+            started = time.perf_counter()
+            for row in chunk:
+                map_row(row)
+            elapsed += time.perf_counter() - started
+            rows += len(chunk)
+    return rows, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure rows/second of pure CSV-to-payload mapping.")
+    parser.add_argument('-c', '--config', type=str, default=os.path.join(os.path.dirname(__file__), '..', 'config.yaml'),
+                        help='config.yaml whose csv_mappings and custom_fields are used')
+    parser.add_argument('-n', '--rows', type=int, default=1000000, help='Rows in the synthetic file')
+    parser.add_argument('--chunk-size', type=int, default=50000, help='Rows parsed before each timed mapping pass')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+    csv_mappings = config['csv_mappings']
+    base_url = 'http://benchmark/api/1.0'
+    plan = MappingPlan(csv_mappings, config.get('custom_fields', {}), base_url)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'rows.csv')
+        write_synthetic_csv(path, csv_mappings, args.rows)
+        print(f"{args.rows} rows, {len(csv_mappings)} mapped columns")
+
+        # Both must produce the same payloads before their speed is worth comparing
+        with open(path, 'r') as csv_file:
+            sample = next(csv.DictReader(csv_file))
+        assert plan.map_row(sample) == map_per_row(csv_mappings, sample)
+        assert prepare_with_plan(plan, sample) == prepare_per_row(config, base_url, sample)
+        with open(path, 'r') as csv_file:
+            assert prepare_with_plan(plan, next(CompactReader(csv_file))) == prepare_with_plan(plan, sample)
+
+        cases = (
+            ("row mapping, per-row loop", lambda row: map_per_row(csv_mappings, row), csv.DictReader),
+            ("row mapping, plan", plan.map_row, csv.DictReader),
+            ("row mapping, plan, compact rows", plan.map_row, CompactReader),
+            ("all payloads, per-row dicts", lambda row: prepare_per_row(config, base_url, row), csv.DictReader),
+            ("all payloads, plan", lambda row: prepare_with_plan(plan, row), csv.DictReader),
+            ("all payloads, plan, compact rows", lambda row: prepare_with_plan(plan, row), CompactReader),
+        )
+        for label, map_row, reader_class in cases:
+            rows, elapsed = time_mapping(path, map_row, args.chunk_size, reader_class)
+            print(f"{label}: {rows / elapsed:,.0f} rows/s ({elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import yaml
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from device42_api import Device42API
+from mock_device42 import MockDevice42
+
+
+def write_config(directory, host, keep_alive):
+    """Write a config.yaml pointing at the mock server."""
+    config = {
+        'host': host,
+        'api_uri_prefix': '/api/1.0',
+        'client_id': 'bench',
+        'client_secret': 'bench',
+        'ssl_verification': False,
+        'http': {'keep_alive': keep_alive},
+        # Every lookup must reach the server, so the lookup cache is off
+        'lookup': {'cache_ttl': 0},
+        'csv_mappings': {'object_type': 'ObjectType', 'name': 'Name'},
+    }
+    path = os.path.join(directory, f"config_{'pooled' if keep_alive else 'unpooled'}.yaml")
+    with open(path, 'w') as file:
+        yaml.safe_dump(config, file)
+    return path
+
+
+def time_lookups(api, count):
+    """Return per-request latencies in milliseconds for `count` device lookups."""
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        api.device_id_by_name('Server1')
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-request latency with and without connection pooling.")
+    parser.add_argument('-n', '--requests', type=int, default=500, help='Lookups per mode')
+    args = parser.parse_args()
+
+    server = MockDevice42().start()
+    server.store.upsert('devices', {'name': 'Server1'})
+    host = server.url
+
+    with tempfile.TemporaryDirectory() as directory:
+        for keep_alive in (False, True):
+            api = Device42API(write_config(directory, host, keep_alive))
+            latencies = time_lookups(api, args.requests)
+            api.close()
+            latencies.sort()
+            print(f"{'pooled' if keep_alive else 'unpooled':>9}: "
+                  f"mean {statistics.mean(latencies):.3f} ms  "
+                  f"p50 {latencies[len(latencies) // 2]:.3f} ms  "
+                  f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.3f} ms")
+
+    server.shutdown()
+    server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import csv
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.parse
+
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+from bench_import import write_csv
+from compact_rows import CompactReader, pack_rows
+from row_mapping import MappingPlan
+
+
+def held_bytes(load):
+    """Return (result of load(), bytes still allocated while the result is held, seconds)."""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - started
+    held, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, held, elapsed
+
+
+def read_dicts(path):
+    with open(path, 'r', newline='') as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def read_dicts_with_post_data(path):
+    """The rows as the compare page used to hold them: each dict plus its URL-quoted JSON copy."""
+    with open(path, 'r', newline='') as csv_file:
+        return [(row, urllib.parse.quote(json.dumps(row))) for row in csv.DictReader(csv_file)]
+
+
+def read_compact(path):
+    with open(path, 'r', newline='') as csv_file:
+        return list(CompactReader(csv_file))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure memory held per CSV row: DictReader dicts vs CompactRows.")
+    parser.add_argument('-c', '--config', type=str, default=os.path.join(BENCH_DIR, '..', 'config.yaml'),
+                        help='config.yaml whose csv_mappings and custom_fields shape the generated file')
+    parser.add_argument('-n', '--rows', type=int, default=100000, help='Rows in the generated file')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as file:
+        config = yaml.safe_load(file)
+    csv_mappings = config['csv_mappings']
+    plan = MappingPlan(csv_mappings, config.get('custom_fields', {}), 'http://benchmark/api/1.0')
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'rows.csv')
+        write_csv(path, csv_mappings, config.get('custom_fields', {}), args.rows)
+        print(f"{args.rows} rows, {len(csv_mappings)} columns, {os.path.getsize(path) / args.rows:.0f} bytes/row on disk")
+
+        dicts, dict_bytes, dict_seconds = held_bytes(lambda: read_dicts(path))
+        compact, compact_bytes, compact_seconds = held_bytes(lambda: read_compact(path))
+        # Both must hold the same rows and map to the same payloads before their sizes are worth comparing
+        assert len(dicts) == len(compact)
+        assert all(dict_row == compact_row and plan.map_row(dict_row) == plan.map_row(compact_row)
+                   for dict_row, compact_row in zip(dicts, compact))
+        dict_payload = len(json.dumps(dicts))
+        compact_payload = len(json.dumps(pack_rows(compact)))
+        del dicts, compact
+        _, post_data_bytes, post_data_seconds = held_bytes(lambda: read_dicts_with_post_data(path))
+
+        print(f"{'Rows held as':<38}{'Bytes/row':>10}{'Read s':>8}")
+        for label, held, elapsed in (
+                ("csv.DictReader dicts + post_data", post_data_bytes, post_data_seconds),
+                ("csv.DictReader dicts", dict_bytes, dict_seconds),
+                ("CompactReader rows", compact_bytes, compact_seconds)):
+            print(f"{label:<38}{held / args.rows:>10.0f}{elapsed:>8.2f}")
+        print(f"Job payload JSON: {dict_payload / args.rows:.0f} bytes/row as dicts, "
+              f"{compact_payload / args.rows:.0f} bytes/row packed")
+
+
+if __name__ == '__main__':
+    main()
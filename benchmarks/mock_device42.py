@@ -0,0 +1,245 @@
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# List endpoint path -> (key holding the objects, ID field), as the real appliance returns them
+OBJECT_TYPES = {
+    "devices": ("Devices", "device_id"),
+    "buildings": ("buildings", "building_id"),
+    "appcomps": ("appcomps", "appcomp_id"),
+    "customers": ("Customers", "id"),
+}
+# Custom field endpoint path -> list endpoint path
+CUSTOM_FIELD_TYPES = {"device": "devices", "building": "buildings", "appcomp": "appcomps", "customer": "customers"}
+
+
+class MockStore:
+    """In-memory Device42 inventory: one name-keyed table per object type."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.objects = {path: {} for path in OBJECT_TYPES}  # path -> {name: record}
+        self.by_id = {path: {} for path in OBJECT_TYPES}  # path -> {id: record}
+
+    def upsert(self, path, fields):
+        """Create or update an object by name, like the appliance's POST; return (record, created)."""
+        _, id_field = OBJECT_TYPES[path]
+        with self._lock:
+            record = self.objects[path].get(fields.get('name'))
+            created = record is None
+            if created:
+                object_id = len(self.by_id[path]) + 1
+                record = {id_field: object_id, 'id': object_id, 'custom_fields': []}
+                self.objects[path][fields.get('name')] = record
+                self.by_id[path][object_id] = record
+            record.update(fields)
+            return dict(record), created
+
+    def set_custom_fields(self, path, object_id, values):
+        """Set custom field key -> value pairs on an object; return False if it doesn't exist."""
+        with self._lock:
+            record = self.by_id[path].get(object_id)
+            if record is None:
+                return False
+            current = {custom_field['key']: custom_field for custom_field in record['custom_fields']}
+            for key, value in values.items():
+                if key in current:
+                    current[key]['value'] = value
+                else:
+                    record['custom_fields'].append({'key': key, 'value': value})
+            return True
+
+    def get(self, path, object_id):
+        with self._lock:
+            record = self.by_id[path].get(object_id)
+            return json.loads(json.dumps(record)) if record is not None else None
+
+    def list(self, path, name=None, offset=0, limit=None):
+        """Return (page of records, total count); customers ignore the name filter and paging, like the appliance."""
+        with self._lock:
+            if path == "customers":
+                records = list(self.objects[path].values())
+                return json.loads(json.dumps(records)), len(records)
+            if name is not None:
+                record = self.objects[path].get(name)
+                records = [record] if record is not None else []
+            else:
+                records = list(self.objects[path].values())
+            page = records[offset:offset + limit] if limit is not None else records[offset:]
+            return json.loads(json.dumps(page)), len(records)
+
+    def count(self, path):
+        with self._lock:
+            return len(self.by_id[path])
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Device42 stand-in: token, list/get/post for each object type, and custom field PUTs."""
+    # HTTP/1.1 so the server honours keep-alive between requests
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; avoid Nagle/delayed-ACK stalls on reused sockets
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _form(self):
+        raw = self.rfile.read(int(self.headers.get('Content-Length', 0))).decode()
+        if self.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(raw or '{}')
+        return {key: values[-1] for key, values in parse_qs(raw, keep_blank_values=True).items()}
+
+    def _handle(self, method):
+        """Apply the server's latency and error injection, then dispatch; returns the status sent."""
+        server = self.server
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split('/') if part]
+        form = self._form() if method in ('POST', 'PUT') else {}
+        server.delay()
+        if parts[:1] != ['tauth'] and server.inject_error():
+            self._send_json({"code": 1, "msg": "injected error"}, server.error_status)
+            return server.error_status
+
+        if parts[:1] == ['tauth']:
+            self._send_json({"token": f"mock-token-{time.monotonic()}", "expires": server.token_lifetime})
+            return 200
+        # /api/1.0/<type>/... and /api/1.0/custom_fields/<type>/
+        if len(parts) < 3 or parts[0] != 'api':
+            self._send_json({"code": 1, "msg": "not found"}, 404)
+            return 404
+        resource = parts[2:]
+        if resource[0] == 'custom_fields' and method == 'PUT' and len(resource) > 1:
+            return self._put_custom_fields(CUSTOM_FIELD_TYPES.get(resource[1]), form)
+        path = resource[0]
+        if path not in OBJECT_TYPES:
+            self._send_json({"code": 1, "msg": "not found"}, 404)
+            return 404
+        if method == 'POST':
+            return self._post_object(path, form)
+        if len(resource) > 1:
+            record = server.store.get(path, int(resource[1])) if resource[1].isdigit() else None
+            self._send_json(record or {"code": 1, "msg": "not found"}, 200 if record else 404)
+            return 200 if record else 404
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        page, total = server.store.list(path, query.get('name'), int(query.get('offset', 0)),
+                                        int(query['limit']) if 'limit' in query else None)
+        list_key, _ = OBJECT_TYPES[path]
+        self._send_json({list_key: page, "total_count": total, "offset": int(query.get('offset', 0))})
+        return 200
+
+    def _post_object(self, path, form):
+        if not form.get('name'):
+            self._send_json({"code": 1, "msg": "name is required"}, 400)
+            return 400
+        record, created = self.server.store.upsert(path, form)
+        _, id_field = OBJECT_TYPES[path]
+        self._send_json({"code": 0, "msg": ["object added/updated", record[id_field], record['name'], True, created]})
+        return 200
+
+    def _put_custom_fields(self, path, form):
+        object_id = form.get('device_id') or form.get('id')
+        if path is None or not str(object_id or '').isdigit():
+            self._send_json({"code": 1, "msg": "object id is required"}, 400)
+            return 400
+        if 'bulk_fields' in form:
+            values = dict(pair.split(':', 1) for pair in form['bulk_fields'].split(',') if ':' in pair)
+        else:
+            values = {form.get('key'): form.get('value')}
+        if not self.server.store.set_custom_fields(path, int(object_id), values):
+            self._send_json({"code": 1, "msg": "object not found"}, 404)
+            return 404
+        self._send_json({"code": 0, "msg": ["custom key pair values added or updated", int(object_id)]})
+        return 200
+
+    def do_GET(self):
+        self.server.count(self._handle('GET'))
+
+    def do_POST(self):
+        self.server.count(self._handle('POST'))
+
+    def do_PUT(self):
+        self.server.count(self._handle('PUT'))
+
+
+class MockDevice42(ThreadingHTTPServer):
+    """Threaded local Device42 API with configurable latency and error injection.
+
+    Every request waits `latency` seconds plus up to `jitter` more, then a random `error_rate`
+    share of API calls (not token requests) is answered with `error_status`, e.g. 503 or 429
+    to exercise the client's retries and adaptive concurrency.
+    """
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500, token_lifetime=3600,
+                 seed=None):
+        super().__init__(('127.0.0.1', port), MockHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.token_lifetime = token_lifetime
+        self.store = MockStore()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.statuses = {}  # status code -> responses sent
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        """Serve on a daemon thread and return self."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def delay(self):
+        with self._lock:
+            seconds = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if seconds:
+            time.sleep(seconds)
+
+    def inject_error(self):
+        if not self.error_rate:
+            return False
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def count(self, status):
+        with self._lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local stand-in for the Device42 API.")
+    parser.add_argument('-p', '--port', type=int, default=8042, help='Port to listen on (127.0.0.1)')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every response')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra seconds, at random')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Share of API calls answered with an error')
+    parser.add_argument('--error-status', type=int, default=500, help='Status code of injected errors')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for repeatable jitter and errors')
+    args = parser.parse_args()
+
+    server = MockDevice42(args.port, args.latency, args.jitter, args.error_rate, args.error_status, seed=args.seed)
+    print(f"Mock Device42 API listening on {server.url} (set host to this in config.yaml)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
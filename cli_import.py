@@ -1,16 +1,94 @@
 import argparse
+import functools
+import json
+from compact_rows import CompactReader
 from device42_api import Device42API
+from import_journal import ImportJournal
+from import_report import ImportReport
+from sharded_import import import_sharded
 import os
-import csv
 
 def parse_arguments():
     """Parse command-line arguments for CSV import."""
     parser = argparse.ArgumentParser(description="Bulk import devices or other objects into Device42.")
     parser.add_argument('-c', '--config', type=str, required=True, help='Path to config.yaml')
     parser.add_argument('-f', '--file', type=str, required=True, help='Path to the CSV file for import')
+    parser.add_argument('-w', '--workers', type=int, default=None,
+                        help='Number of rows to import concurrently (defaults to import.workers in config.yaml)')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='Rows read and imported per chunk (defaults to import.chunk_size in config.yaml)')
+    parser.add_argument('--delta', action='store_true',
+                        help='Only send objects and fields that differ from what is already in Device42')
+    parser.add_argument('--journal', type=str, default=None,
+                        help='Checkpoint journal of completed rows (default: <file>.journal.sqlite3)')
+    parser.add_argument('--resume', action='store_true',
+                        help='Skip rows the journal shows were already imported by an earlier run')
+    parser.add_argument('--skip-validation', action='store_true',
+                        help='Import without validating the whole file first')
+    parser.add_argument('--validate-only', action='store_true',
+                        help='Validate the file and exit without importing anything')
+    parser.add_argument('--timings', action='store_true',
+                        help='Print the per-object time spent creating the object and updating custom fields')
+    parser.add_argument('--metrics-file', type=str, default=None,
+                        help='Also write the run\'s request, phase and throughput metrics to this file as JSON')
+    parser.add_argument('--file-order', action='store_true',
+                        help='Import rows in file order instead of dependency-ordered waves')
+    parser.add_argument('--shards', type=int, default=1,
+                        help='Split the file across this many worker processes, each with its own session')
+    parser.add_argument('--coalesce', choices=['merge', 'last', 'none'], default=None,
+                        help='How rows for the same object are combined before sending (defaults to import.coalesce)')
     return parser.parse_args()
 
 
+def format_timings(timings):
+    """Format a phase -> seconds dict as 'create 0.120s, custom_fields 0.045s'."""
+    return ", ".join(f"{phase} {seconds:.3f}s" for phase, seconds in timings.items())
+
+
+def print_result(result, timings=False):
+    """Print the outcome of one imported row; called from the import workers as rows finish."""
+    status = f"{result.status} ({result.action})" if result.action else result.status
+    line = f"Row {result.row_num}: {status} {result.object_type} {result.name}"
+    if timings and result.timings:
+        line += f" ({format_timings(result.timings)})"
+    if result.error:
+        line += f" - {result.status_code or ''} {result.error}"
+    for custom_field in result.custom_fields:
+        if custom_field['error']:
+            line += (f"\n    Error updating custom field '{custom_field['field']}': "
+                     f"{custom_field['status_code']} - {custom_field['error']}")
+    # One write per row, flushed straight away, so lines from concurrent workers and shard processes don't interleave
+    print(line + "\n", end='', flush=True)
+
+
+def format_metrics(metrics):
+    """Format per-endpoint request stats, per-phase times and throughput as a table."""
+    lines = [f"{'Method':<7}{'Endpoint':<42}{'Calls':>7}{'Errors':>8}{'Retries':>9}"
+             f"{'p50 ms':>9}{'p99 ms':>9}{'Total s':>9}"]
+    for stat in metrics.request_stats():
+        lines.append(f"{stat['method']:<7}{stat['endpoint']:<42}{stat['calls']:>7}{stat['errors']:>8}"
+                     f"{stat['retries']:>9}{stat['p50'] * 1000:>9.1f}{stat['p99'] * 1000:>9.1f}{stat['total']:>9.2f}")
+    phases = metrics.phase_stats()
+    if phases:
+        lines.append(f"{'Phase':<49}{'Rows':>7}{'':>17}{'p50 ms':>9}{'p99 ms':>9}{'Total s':>9}")
+        for stat in phases:
+            lines.append(f"{stat['phase']:<49}{stat['count']:>7}{'':>17}{stat['p50'] * 1000:>9.1f}"
+                         f"{stat['p99'] * 1000:>9.1f}{stat['total']:>9.2f}")
+    lines.append(f"Throughput: {metrics.rows_per_second():.1f} rows/s")
+    return "\n".join(lines)
+
+
+def print_validation(validation):
+    """Print the issues found by the pre-import validation."""
+    for issue in validation.errors:
+        print(f"Error: {issue}")
+    for issue in validation.warnings:
+        print(f"Warning: {issue}")
+    for check, count in validation.truncated().items():
+        print(f"... and {count} more '{check}' issues")
+    print(f"Validated {validation.rows} rows: {len(validation.errors)} errors, {len(validation.warnings)} warnings listed.")
+
+
 def main():
     # Parse command-line arguments
     args = parse_arguments()
@@ -27,16 +105,66 @@ def main():
     # Initialize the Device42API with the config file
     device42_api = Device42API(args.config)
 
+    # Validate the whole file before any HTTP traffic is sent for it
+    if not args.skip_validation:
+        with open(args.file, 'r') as csv_file:
+            validation = device42_api.validate_csv(csv_file)
+        print_validation(validation)
+        if not validation.ok:
+            print(f"Import blocked: {args.file} has errors. Fix them or rerun with --skip-validation.")
+            return
+        if args.validate_only:
+            return
+
+    # Every run checkpoints completed rows; only --resume reuses what an earlier run recorded
+    journal = ImportJournal(args.journal or f"{args.file}.journal.sqlite3")
+    if args.resume:
+        print(f"Resuming: {journal.count()} rows already imported according to {journal.db_path}.")
+    else:
+        journal.clear()
+
     # Open and import from the CSV file
+    metrics = device42_api.metrics
     try:
-        with open(args.file, 'r') as csv_file:
-            csv_reader = csv.DictReader(csv_file)
-            # Pass the entire list of rows to the API for processing
-            rows = [row for row in csv_reader]
-            device42_api.import_from_csv(rows)
-        print(f"CSV file {args.file} processed successfully.")
+        delta = args.delta or device42_api.delta
+        listener = functools.partial(print_result, timings=args.timings)
+        dependency_order = False if args.file_order else None
+        if args.shards > 1:
+            # Each shard process prefetches for itself in delta mode; the journal is shared
+            report, metrics, errors = import_sharded(args.config, args.file, args.shards, listener=listener,
+                                                     workers=args.workers, dependency_order=dependency_order,
+                                                     chunk_size=args.chunk_size, delta=delta,
+                                                     journal_path=journal.db_path, coalesce=args.coalesce)
+            for error in errors:
+                print(f"Error: {error}")
+        else:
+            errors = []
+            if delta:
+                # Compare against one paged listing per object type rather than two lookups per row
+                device42_api.prefetch(delta=True)
+            with open(args.file, 'r') as csv_file:
+                # Rows share their header and repeated values instead of each being a dict
+                csv_reader = CompactReader(csv_file)
+                # Stream the reader straight through; results are printed as rows finish, not kept
+                report = ImportReport(keep_imported=False, listener=listener)
+                device42_api.import_from_csv(csv_reader, workers=args.workers, report=report,
+                                             dependency_order=dependency_order, chunk_size=args.chunk_size,
+                                             delta=delta, journal=journal, coalesce=args.coalesce)
+        if args.timings:
+            print(f"Total time per phase: {format_timings(report.timing_totals())}")
+        print(f"CSV file {args.file} processed: {report.summary()}.")
+        if errors:
+            print("Rerun with --resume to skip the rows that were already imported.")
     except Exception as e:
         print(f"Error processing file {args.file}: {str(e)}")
+        print("Rerun with --resume to skip the rows that were already imported.")
+    finally:
+        # Show where the time went, whether or not the run finished
+        print(format_metrics(metrics))
+        if args.metrics_file:
+            with open(args.metrics_file, 'w') as metrics_file:
+                json.dump(metrics.to_dict(), metrics_file, indent=2)
+        journal.close()
 
 
 if __name__ == '__main__':
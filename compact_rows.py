@@ -0,0 +1,124 @@
+import csv
+import sys
+from collections.abc import Mapping
+
+
+class RowHeader:
+    """Column names shared by every row of one file, interned and indexed once."""
+    __slots__ = ('columns', 'index')
+
+    def __init__(self, columns):
+        self.columns = tuple(sys.intern(str(column)) for column in columns)
+        # Like csv.DictReader, a repeated column name keeps its first position and its last value
+        self.index = dict(zip(self.columns, range(len(self.columns))))
+
+
+class CompactRow(Mapping):
+    """Read-only CSV row: a tuple of values plus the header it shares with the rest of its file.
+
+    Behaves like the dict csv.DictReader would have produced (short rows read as None in the
+    missing columns) at a fraction of the memory, since no per-row hash table or key strings
+    are kept. Values past the end of the header are dropped.
+    """
+    __slots__ = ('header', 'values')
+
+    def __init__(self, header, values):
+        self.header = header
+        missing = len(header.columns) - len(values)
+        self.values = tuple(values) + (None,) * missing if missing > 0 else tuple(values[:len(header.columns)])
+
+    def __getitem__(self, column):
+        return self.values[self.header.index[column]]
+
+    def get(self, column, default=None):
+        position = self.header.index.get(column)
+        return default if position is None else self.values[position]
+
+    def __contains__(self, column):
+        return column in self.header.index
+
+    def __iter__(self):
+        return iter(self.header.index)
+
+    def __len__(self):
+        return len(self.header.index)
+
+    def __repr__(self):
+        return f"CompactRow({dict(self)!r})"
+
+
+class ValuePool:
+    """Shares one string object between equal values in low-cardinality columns.
+
+    Columns such as ObjectType or a parent Customer repeat a handful of values across a whole
+    file. Every column starts with a pool; once a column has more than `max_distinct` distinct
+    values (names, serial numbers) its pool is dropped and its values are kept as read.
+    """
+
+    def __init__(self, width, max_distinct=1024):
+        self.max_distinct = max_distinct
+        self._pools = [(position, {}) for position in range(width)]
+        self._rows = 0
+
+    def intern(self, values):
+        """Replace values in place with the pooled instance of an equal value."""
+        width = len(values)
+        for position, pool in self._pools:
+            if position < width:
+                value = values[position]
+                values[position] = pool.setdefault(value, value)
+        self._rows += 1
+        # Checking every few hundred rows keeps the per-row cost down to the lookups themselves
+        if self._rows % 256 == 0:
+            self._pools = [(position, pool) for position, pool in self._pools if len(pool) <= self.max_distinct]
+        return values
+
+
+class CompactReader:
+    """Drop-in replacement for csv.DictReader that yields CompactRows with pooled values."""
+
+    def __init__(self, csv_file, fieldnames=None, max_distinct=1024, **kwargs):
+        self.reader = csv.reader(csv_file, **kwargs)
+        self.header = RowHeader(next(self.reader, []) if fieldnames is None else fieldnames)
+        self.pool = ValuePool(len(self.header.columns), max_distinct)
+
+    @property
+    def fieldnames(self):
+        return list(self.header.columns)
+
+    @property
+    def line_num(self):
+        return self.reader.line_num
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        values = next(self.reader)
+        # Blank lines are skipped, as csv.DictReader does
+        while not values:
+            values = next(self.reader)
+        return CompactRow(self.header, self.pool.intern(values))
+
+
+def pack_rows(rows):
+    """Return rows in a JSON-friendly form, with the column names stored once when all rows share them.
+
+    Rows with differing columns (e.g. hand-built dicts) are kept as a list of dicts.
+    """
+    rows = list(rows)
+    if rows and all(isinstance(row, CompactRow) and row.header.columns == rows[0].header.columns for row in rows):
+        return {"columns": list(rows[0].header.columns), "rows": [list(row.values) for row in rows]}
+    columns = list(rows[0]) if rows else []
+    if any(len(row) != len(columns) or any(column not in row for column in columns) for row in rows):
+        return [dict(row) for row in rows]
+    return {"columns": columns, "rows": [[row[column] for column in columns] for row in rows]}
+
+
+def unpack_rows(packed, max_distinct=1024):
+    """Return the rows of a pack_rows() result as CompactRows; a list of dicts is returned as is."""
+    if not isinstance(packed, dict):
+        return packed
+    header = RowHeader(packed['columns'])
+    pool = ValuePool(len(header.columns), max_distinct)
+    return [CompactRow(header, pool.intern(values)) for values in packed['rows']]
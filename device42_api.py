@@ -1,14 +1,143 @@
-import csv
+import functools
+import itertools
+import os
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime, timezone
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 import requests
 import yaml
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 import urllib3
+from urllib3.util.retry import Retry
 import pprint
 import json
+from csv_validation import CsvValidator
+from import_journal import row_hash
+from import_metrics import LATENCY_BUCKETS, ImportMetrics
+from import_report import ImportReport, RowResult
+from import_scheduler import ImportScheduler
+from lookup_cache import SingleFlight, shared_cache
+from rate_limiter import AdaptiveConcurrency, TokenBucket
+from row_mapping import MappingPlan
+from snapshot_store import SnapshotStore
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-class Device42API:
-    def __init__(self, config_file):
+# List endpoint response layout per object type: (key holding the objects, ID field, type label)
+LIST_RESPONSE_KEYS = {
+    "Device": ("Devices", "device_id", "device"),
+    "Building": ("buildings", "building_id", "building"),
+    "Application": ("appcomps", "appcomp_id", "application"),
+    "Customer": ("Customers", "id", "customer"),
+}
+
+
+def cached_lookup(kind, object_type):
+    """Cache a single-argument lookup method in the client's LookupCache; None results are not cached.
+
+    Concurrent calls for the same value share one request.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, value):
+            key = (kind, object_type, value)
+            if self.cache is None:
+                return self.lookups_in_flight.do(key, lambda: method(self, value))
+            hit, cached = self.cache.get(key)
+            if hit:
+                return cached
+            result = self.lookups_in_flight.do(key, lambda: method(self, value))
+            if result is not None:
+                self.cache.set(key, result)
+            return result
+        return wrapper
+    return decorator
+
+
+def _normalize(value):
+    """Normalize a field value for comparison: None and empty are equal, whitespace is ignored."""
+    return "" if value is None else str(value).strip()
+
+
+def _custom_field_value(record, key, label):
+    """Return the current value of a custom field on a Device42 record, looked up by key or label."""
+    for custom_field in record.get('custom_fields') or []:
+        if custom_field.get('key') in (key, label):
+            return _normalize(custom_field.get('value'))
+    return None
+
+
+def changed_fields(device, record, custom_fields_for_type):
+    """Return (standard fields, custom fields) of a mapped row that differ from the existing `record`."""
+    changed_standard = {}
+    changed_custom = {}
+    for api_field, value in device.items():
+        if api_field == 'name':
+            continue
+        if api_field in custom_fields_for_type:
+            # Empty custom field values are never sent, so they can't differ
+            normalized = _normalize(value)
+            if normalized and _custom_field_value(record, api_field, custom_fields_for_type[api_field]) != normalized:
+                changed_custom[api_field] = value
+        elif _normalize(record.get(api_field)) != _normalize(value):
+            # Fields the API doesn't return compare as empty, so any value for them is sent
+            changed_standard[api_field] = value
+    return changed_standard, changed_custom
+
+
+def token_lifetime(token_data, default):
+    """Return the seconds a token is valid for, from expires_in/expires in the token response or `default`."""
+    if token_data.get('expires_in') is not None:
+        return float(token_data['expires_in'])
+    expires = token_data.get('expires')
+    try:
+        if isinstance(expires, (int, float)):
+            # Large numbers are an epoch timestamp, small ones a lifetime in seconds
+            return expires - time.time() if expires > 1e9 else float(expires)
+        if isinstance(expires, str):
+            expires_at = datetime.fromisoformat(expires.replace('Z', '+00:00'))
+            if expires_at.tzinfo is None:
+                expires_at = expires_at.replace(tzinfo=timezone.utc)
+            return (expires_at - datetime.now(timezone.utc)).total_seconds()
+    except ValueError:
+        pass
+    return default
+
+
+# Long-lived clients per config file path: path -> (config mtime, Device42API)
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(config_file):
+    """Return the process-wide Device42API for a config file, rebuilt only when the file changes.
+
+    The client is thread-safe, so one instance (one connection pool, one cached token) can be
+    shared by every request and background job in the process.
+    """
+    mtime = os.path.getmtime(config_file)
+    with _clients_lock:
+        entry = _clients.get(config_file)
+        if entry is None or entry[0] != mtime:
+            replaced = entry[1] if entry is not None else None
+            entry = (mtime, Device42API(config_file))
+            _clients[config_file] = entry
+            if replaced is not None:
+                # Threads still holding the old client can finish with it; see Device42API.close
+                replaced.close()
+        return entry[1]
+
+
+class BaseDevice42API:
+    """Config, mapping and per-row import decisions shared by Device42API and AsyncDevice42API.
+
+    Everything here is free of I/O: the clients send the requests and decide how rows run
+    concurrently, and call back into these methods for what to send and how to record it.
+    """
+
+    def __init__(self, config_file, cache=None):
         # Load configuration from YAML file
         with open(config_file, 'r') as file:
             self.config = yaml.safe_load(file)
@@ -23,9 +152,485 @@ class Device42API:
         self.custom_fields = self.config.get('custom_fields', {})  # Load custom fields for all object types
         self.required_fields = self.config.get('required_fields', [])  # Load required fields, allow empty list
 
+        # Import engine settings, all optional
+        import_config = self.config.get('import', {}) or {}
+        self.dependency_order = import_config.get('dependency_order', True)
+        self.chunk_size = import_config.get('chunk_size', 5000)
+        self.delta = import_config.get('delta', False)
+        # Rows for the same object in one chunk are sent as one row; 'none' sends every row
+        coalesce = import_config.get('coalesce', 'merge')
+        self.coalesce = None if coalesce in (None, False, 'none') else coalesce
+        self.batch_custom_fields = import_config.get('batch_custom_fields', ['Device'])
+        self.scheduler = ImportScheduler(self.csv_mappings, import_config.get('reference_fields'))
+        # Mappings, endpoints and custom field payloads compiled once rather than rebuilt per row
+        self.mapping_plan = MappingPlan(self.csv_mappings, self.custom_fields, f"{self.host}{self.api_uri_prefix}")
+
+        # Lookup settings, all optional
+        lookup_config = self.config.get('lookup', {}) or {}
+        self.page_size = lookup_config.get('page_size', 1000)
+        self.prefetch_min_rows = lookup_config.get('prefetch_min_rows', 50)
+        self.prefetched = {}  # object_type -> {name: record}, filled by prefetch()
+        # Name and ID lookups are cached per host and shared by every client in the process
+        if cache is None and lookup_config.get('cache_ttl', 300) > 0:
+            cache = shared_cache(self.host, lookup_config.get('cache_ttl', 300),
+                                 lookup_config.get('cache_max_entries', 10000))
+        self.cache = cache
+
+        # Local inventory snapshot, used for lookups once an object type has been synced
+        snapshot_config = self.config.get('snapshot', {}) or {}
+        self.snapshot = SnapshotStore(snapshot_config['path']) if snapshot_config.get('path') else None
+        self.snapshot_lookups = snapshot_config.get('use_for_lookups', True)
+        self.snapshot_incremental_types = snapshot_config.get('incremental_types', ['Device'])
+        self.snapshot_incremental_param = snapshot_config.get('incremental_param', 'last_updated_gt')
+        self.snapshot_skew_seconds = snapshot_config.get('skew_seconds', 300)
+        # Imports don't update the snapshot, so delta imports only compare against it when asked to
+        self.snapshot_for_delta = snapshot_config.get('use_for_delta', False)
+        self.snapshot_max_age = snapshot_config.get('max_age', 3600)
+
+        # HTTP connection settings, all optional; each client builds its own transport from them
+        self.http_config = self.config.get('http', {}) or {}
+        self.retry_statuses = set(self.http_config.get('retry_statuses', [429, 500, 502, 503, 504]))
+        self.max_retries = self.http_config.get('max_retries', 3)
+        self.backoff_factor = self.http_config.get('backoff_factor', 0.5)
+        # Request, phase and throughput metrics; every request, the token included, is recorded
+        metrics_config = self.config.get('metrics', {}) or {}
+        self.metrics = ImportMetrics(metrics_config.get('latency_buckets', LATENCY_BUCKETS))
+
+        # Client-side throttling, all optional
+        rate_config = self.config.get('rate_limit', {}) or {}
+        requests_per_second = rate_config.get('requests_per_second', 0)
+        self.rate_limiter = TokenBucket(requests_per_second, rate_config.get('burst')) if requests_per_second else None
+
+        # Token lifetime settings, all optional
+        auth_config = self.config.get('auth', {}) or {}
+        self.token_lifetime = auth_config.get('token_lifetime', 3600)  # Used when the token response has no expiry
+        self.token_refresh_margin = auth_config.get('refresh_margin', 60)
+        self.token = None
+        self.token_expires_at = 0.0
+
+    def _retry_after(self, response):
+        """Return the Retry-After delay in seconds, or None if the response has no usable one."""
+        try:
+            return float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            return None
+
+    def _retry_delay(self, retried, response=None):
+        """Return the seconds to wait before retry number `retried` (from 0) of a request."""
+        return (self._retry_after(response) if response is not None else None) or self.backoff_factor * 2 ** retried
+
+    def _record_phase(self, phase, seconds, result=None):
+        """Record time spent in an import phase in the metrics and on the row's RowResult."""
+        self.metrics.observe_phase(phase, seconds)
+        if result is not None:
+            result.add_timing(phase, seconds)
+
+    def record_id(self, object_type, record):
+        """Return the Device42 ID of a list or detail record."""
+        return record.get(LIST_RESPONSE_KEYS[object_type][1], record.get('id'))
+
+    def snapshot_covers(self, object_type, delta=False):
+        """Return True if lookups for this object type are answered from the local snapshot.
+
+        With `delta`, only when snapshot.use_for_delta is set and the type was synced less than
+        snapshot.max_age seconds ago, since a stale snapshot would hide edits made in Device42.
+        """
+        if self.snapshot is None or not self.snapshot_lookups or not self.snapshot.has(object_type):
+            return False
+        return not delta or (self.snapshot_for_delta and self.snapshot.age(object_type) <= self.snapshot_max_age)
+
+    def _page_params(self, params, offset):
+        return dict(params or {}, limit=self.page_size, offset=offset)
+
+    def _list_page(self, object_type, response, offset, previous_first_id):
+        """Read one list response; return (records, offset of the next page or None when done, first ID)."""
+        if response.status_code != 200:
+            raise Exception(f"Error listing {object_type}: {response.status_code} - {response.text}")
+        list_key, id_field, _ = LIST_RESPONSE_KEYS[object_type]
+        data = response.json()
+        page = data.get(list_key) or []
+        if not page:
+            return [], None, None
+        # Some endpoints (customers) ignore limit/offset and return everything every time
+        first_id = page[0].get(id_field)
+        if first_id is not None and first_id == previous_first_id:
+            return [], None, first_id
+        offset += len(page)
+        # The appliance may cap limit below page_size, so a short page only ends the listing
+        # when total_count says nothing is left
+        total_count = data.get('total_count')
+        if total_count is not None and offset >= total_count:
+            return page, None, first_id
+        return page, offset, first_id
+
+    def _name_index(self, records):
+        """Return a name -> record index, keeping the first match like the *_id_by_name lookups."""
+        index = {}
+        for obj in records:
+            index.setdefault(obj.get('name'), obj)
+        return index
+
+    def _prefetch_types(self, object_types=None, delta=False):
+        """Return the object types prefetch() should list; by default those the snapshot doesn't cover."""
+        if object_types is None:
+            return [object_type for object_type in LIST_RESPONSE_KEYS
+                    if not self.snapshot_covers(object_type, delta)]
+        return [object_type for object_type in object_types if object_type in LIST_RESPONSE_KEYS]
+
+    def _local_existing(self, name, object_type, index=None, delta=False):
+        """Answer check_existing from `index`, the prefetched index or the snapshot; None means ask the API."""
+        index = (self.prefetched if index is None else index).get(object_type)
+        if index is not None:
+            record = index.get(name)
+            if record is not None:
+                return {"type": LIST_RESPONSE_KEYS[object_type][2], "data": record}
+            return {"type": object_type, "data": {}}
+
+        if self.snapshot_covers(object_type, delta):
+            record = self.snapshot.get(object_type, name)
+            if record is not None:
+                return {"type": LIST_RESPONSE_KEYS[object_type][2], "data": record}
+            return {"type": object_type, "data": {}}
+        return None
+
+    def _standard_fields(self, device):
+        """Return the fields of a mapped object that are posted to its endpoint.
+
+        Missing values (None, e.g. from a short CSV row) are left out: requests drops them from
+        form data, but aiohttp would send the string "None".
+        """
+        # Rows mapped by the plan only hold mapped fields, so complete ones are sent as they are
+        if device.keys() <= self.mapping_plan.api_fields and None not in device.values():
+            return device
+        return {field: value for field, value in device.items()
+                if value is not None and field in self.mapping_plan.api_fields}
+
+    def _bulk_fields_payload(self, object_type, object_id, fields):
+        """Return the single bulk_fields PUT for several custom fields, or None if they must be sent one by one."""
+        # bulk_fields is "key1:value1,key2:value2", so values containing either separator can't be batched
+        batchable = not any(',' in str(item) or ':' in str(item) for pair in fields.items() for item in pair)
+        if len(fields) > 1 and batchable and object_type in self.batch_custom_fields:
+            return {
+                self.mapping_plan.for_type(object_type).id_field: object_id,
+                "bulk_fields": ",".join(f"{key}:{value}" for key, value in fields.items()),
+            }
+        return None
+
+    def _record_custom_field(self, result, object_type, csv_field, response):
+        """Record the outcome of a custom field PUT on the row's RowResult."""
+        if result is not None:
+            labels = self.mapping_plan.for_type(object_type).custom_fields
+            error = None if response.status_code == 200 else response.text
+            result.add_custom_field(labels.get(csv_field, csv_field), response.status_code, error, key=csv_field)
+
+    def _plan_import(self, csv_data, report, dependency_order, chunk_size, delta, coalesce, numbered):
+        """Resolve import_from_csv options against the config and start the run's metrics.
+
+        Returns (report, delta, waves), where `waves` yields (wave, duplicates) pairs and only
+        reads the next chunk of rows once the previous chunk's waves have all been taken.
+        """
+        if report is None:
+            report = ImportReport()
+        # A single row may be a dict or a CompactRow
+        rows = iter([csv_data] if isinstance(csv_data, Mapping) else csv_data)
+        if dependency_order is None:
+            dependency_order = self.dependency_order
+        if delta is None:
+            delta = self.delta
+        if coalesce is None:
+            coalesce = self.coalesce
+        chunk_size = chunk_size or self.chunk_size or None  # None reads the whole input as one chunk
+        self.metrics.import_started()
+        return report, delta, self._waves(rows, chunk_size, dependency_order, coalesce, numbered)
+
+    def _waves(self, rows, chunk_size, dependency_order, coalesce, numbered):
+        row_num = 0
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                return
+            numbered_rows = chunk if numbered else list(enumerate(chunk, start=row_num + 1))
+            row_num += len(chunk)
+            duplicates = {}  # row_num sent -> row_nums coalesced into it
+            if coalesce and coalesce != 'none':
+                numbered_rows, duplicates = self.scheduler.coalesce(numbered_rows, coalesce)
+            for wave in self.scheduler.waves(numbered_rows) if dependency_order else [numbered_rows]:
+                yield wave, duplicates
+
+    def _row_key(self, row):
+        """Return the (object_type, name) identity of a CSV row."""
+        return row.get(self.csv_mappings['object_type']), row.get(self.csv_mappings['name'])
+
+    def _journal_entry(self, journal, row, row_num):
+        """Return (journal key, entry or None) for a row; both are None without a journal."""
+        if journal is None:
+            return None, None
+        key = row_hash(row_num, row)
+        return key, journal.lookup(key)
+
+    def _finish_row(self, report, result, journal, key, entry, duplicates=()):
+        """Checkpoint a row's result in the journal if there is one and add it to the report.
+
+        `duplicates` are the numbers of rows coalesced into this one; each gets a result too.
+        """
+        # Resumed rows only need a new entry if custom fields were retried
+        if journal is not None and result.status == RowResult.IMPORTED and (entry is None or entry[1]):
+            failed = [custom_field['key'] for custom_field in result.custom_fields if custom_field['error']]
+            journal.record(key, result, failed)
+        self.metrics.observe_row(result.status)
+        report.add(result)
+        for duplicate_num in duplicates:
+            self.metrics.observe_row(result.status)
+            report.add(result.coalesced(duplicate_num))
+
+    def _resumed_row(self, row, row_num, object_id, failed_custom_fields):
+        """Return (result, custom fields to retry) for a row the journal says is committed."""
+        object_type, name = self._row_key(row)
+        result = RowResult(row_num, object_type, name)
+        result.status = RowResult.IMPORTED
+        result.action = RowResult.RESUMED
+        result.object_id = object_id
+        fields = {key: row.get(self.csv_mappings.get(key)) for key in failed_custom_fields or ()}
+        return result, fields
+
+    def _mark_failed(self, result, error):
+        """Mark a row failed because of an unexpected exception."""
+        result.status = RowResult.FAILED
+        result.error = str(error) or type(error).__name__
+        return result
+
+    def _failed_row(self, row, row_num, error):
+        object_type, name = self._row_key(row)
+        return self._mark_failed(RowResult(row_num, object_type, name), error)
+
+    def _start_row(self, row, row_num):
+        """Return (RowResult, type plan, mapped fields) for a row; unsupported types come back skipped with no plan."""
+        plan = self.mapping_plan
+        object_type = row.get(plan.type_column)
+        result = RowResult(row_num, object_type, row.get(plan.name_column))
+        type_plan = plan.for_type(object_type)
+        if type_plan is None:
+            result.status = RowResult.SKIPPED
+            result.error = f"Unsupported object type: {object_type}"
+            return result, None, None
+        # Map CSV columns to API fields based on config.yaml, excluding object_type
+        return result, type_plan, plan.map_row(row)
+
+    def _record_response(self, result, response):
+        """Record the outcome of an object's POST on its RowResult."""
+        result.status_code = response.status_code
+        if response.status_code == 200:
+            result.status = RowResult.IMPORTED
+        else:
+            result.status = RowResult.FAILED
+            result.error = response.text
+        return result
+
+    def _plan_delta(self, device, record, object_type, result):
+        """Decide what a delta import sends for an object that already exists.
+
+        Returns (fields to POST or None, custom fields to PUT or None) and sets the result's
+        status and action; neither is sent for an unchanged object.
+        """
+        changed_standard, changed_custom = changed_fields(
+            device, record, self.mapping_plan.for_type(object_type).custom_fields)
+
+        result.status = RowResult.IMPORTED
+        if not changed_standard and not changed_custom:
+            result.action = RowResult.UNCHANGED
+            return None, None
+        result.action = RowResult.UPDATED
+
+        if changed_standard:
+            # Custom field values are sent with the POST as well, like a full import
+            changed = dict(changed_standard, **changed_custom)
+            changed['name'] = device['name']
+            return changed, None
+
+        # Only custom fields changed, so the object itself doesn't need to be posted again
+        result.object_id = self.record_id(object_type, record)
+        return None, changed_custom
+
+
+class Device42API(BaseDevice42API):
+    def __init__(self, config_file, cache=None):
+        super().__init__(config_file, cache)
+
+        # Thread pool settings, all optional
+        import_config = self.config.get('import', {}) or {}
+        self.workers = import_config.get('workers', 1)
+        self.max_in_flight = import_config.get('max_in_flight')  # Defaults to twice the worker count
+        self.custom_field_workers = import_config.get('custom_field_workers', 4)
+        self._custom_field_executor = None
+        self._pool_lock = threading.Lock()
+        self._closed = False
+
+        # Pre-import validation settings, all optional
+        validation_config = self.config.get('validation', {}) or {}
+        self.validator = CsvValidator(
+            self.csv_mappings,
+            required_fields=self.required_fields,
+            object_types=LIST_RESPONSE_KEYS.keys(),
+            numeric_fields=validation_config.get('numeric_fields', ['latitude', 'longitude']),
+            null_values=validation_config.get('null_values', ['', 'NA']),
+            batch_size=validation_config.get('batch_size', 50000),
+            max_examples=validation_config.get('max_examples', 20),
+        )
+        self.lookups_in_flight = SingleFlight()
+
+        # Adaptive concurrency, all optional
+        rate_config = self.config.get('rate_limit', {}) or {}
+        self.concurrency = None
+        if rate_config.get('adaptive', True):
+            self.concurrency = AdaptiveConcurrency(
+                minimum=rate_config.get('min_concurrency', 1),
+                maximum=rate_config.get('max_concurrency', 16),
+                latency_target=rate_config.get('latency_target', 2.0),
+                cooldown=rate_config.get('cooldown', 1.0),
+            )
+        # Retries the session made itself would bypass the throttle, so _send retries instead
+        self.retry_in_send = self.rate_limiter is not None or self.concurrency is not None
+
+        self.timeout = (self.http_config.get('connect_timeout', 5), self.http_config.get('read_timeout', 60))
+        self.session = self._build_session(self.http_config)
+        self._token_lock = threading.Lock()
+
         # Get the token on initialization
         self.token = self.get_token()
 
+    def _build_session(self, http_config):
+        """Build a pooled, keep-alive requests Session with retry/backoff on 429 and 5xx responses.
+
+        With `retry_in_send` the session doesn't retry at all; _send does, one throttled attempt at a time.
+        """
+        retry = Retry(
+            total=0 if self.retry_in_send else self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=self.retry_statuses,
+            # Device42 POSTs are upserts keyed on name, so they are safe to re-send
+            allowed_methods=frozenset(['GET', 'POST', 'PUT']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=http_config.get('pool_connections', 4),
+            pool_maxsize=http_config.get('pool_maxsize', 16),
+            max_retries=retry,
+        )
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.verify = self.ssl_verification
+        if not http_config.get('keep_alive', True):
+            session.headers['Connection'] = 'close'
+        return session
+
+    def _request(self, method, url, authenticate=True, **kwargs):
+        """Send a request through the pooled session with the configured timeout.
+
+        Authenticated requests always carry the current bearer token, refreshed before it
+        expires; a 401 refreshes the token and retries the request once.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        kwargs.setdefault('verify', self.ssl_verification)
+        if not authenticate:
+            return self._send(method, url, **kwargs)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        token = self.current_token()
+        headers['Authorization'] = f"Bearer {token}"
+        response = self._send(method, url, headers=headers, **kwargs)
+        if response.status_code == 401:
+            self.metrics.observe_retry(method, url)
+            headers['Authorization'] = f"Bearer {self.refresh_token(token)}"
+            response = self._send(method, url, headers=headers, **kwargs)
+        return response
+
+    def _send(self, method, url, **kwargs):
+        """Send one request within the rate limit and the adaptive concurrency limit, and record its metrics.
+
+        Errors, 429/5xx responses (including ones the session retried) and slow responses
+        shrink the concurrency limit; healthy responses grow it back. With `retry_in_send`,
+        429/5xx responses and connection errors are retried here like in the async client, so
+        every attempt takes a token and a concurrency slot.
+        """
+        started = time.perf_counter()
+        retried = 0
+        while True:
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            if self.concurrency is not None:
+                self.concurrency.acquire()
+            attempt_started = time.perf_counter()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except Exception as e:
+                latency = time.perf_counter() - attempt_started
+                if self.concurrency is not None:
+                    self.concurrency.release(latency, True)
+                retryable = isinstance(e, (requests.ConnectionError, requests.Timeout))
+                if not self.retry_in_send or not retryable or retried >= self.max_retries:
+                    self.metrics.observe_request(method, url, time.perf_counter() - started, retries=retried,
+                                                 error=e)
+                    raise
+                delay = self._retry_delay(retried)
+            else:
+                latency = time.perf_counter() - attempt_started
+                retries = getattr(response.raw, 'retries', None)
+                session_retried = len(retries.history) if retries else 0
+                if self.concurrency is not None:
+                    self.concurrency.release(latency,
+                                             response.status_code in self.retry_statuses or bool(session_retried))
+                if (not self.retry_in_send or response.status_code not in self.retry_statuses
+                        or retried >= self.max_retries):
+                    self.metrics.observe_request(method, url, time.perf_counter() - started, response.status_code,
+                                                 retried + session_retried)
+                    return response
+                delay = self._retry_delay(retried, response)
+            retried += 1
+            time.sleep(delay)
+
+    def render_metrics(self):
+        """Return the client's metrics in the Prometheus text format, for the web apps' /metrics route."""
+        gauges = {}
+        if self.concurrency is not None:
+            gauges['device42_concurrency_limit'] = ('Current adaptive limit on concurrent requests.',
+                                                    int(self.concurrency.limit))
+            gauges['device42_requests_in_flight'] = ('Requests currently being sent.', self.concurrency.in_flight)
+        if self.cache is not None:
+            stats = self.cache.stats()
+            gauges['device42_lookup_cache_hit_ratio'] = (
+                'Share of cached name/ID lookups answered from the cache.',
+                stats['hits'] / (stats['hits'] + stats['misses']) if stats['hits'] + stats['misses'] else 0.0)
+        return self.metrics.render(gauges)
+
+    def current_token(self):
+        """Return a token that is valid for at least refresh_margin more seconds."""
+        if time.monotonic() < self.token_expires_at - self.token_refresh_margin:
+            return self.token
+        return self.refresh_token(self.token)
+
+    def refresh_token(self, stale_token):
+        """Fetch a new token unless another thread already replaced `stale_token`."""
+        with self._token_lock:
+            if self.token != stale_token and time.monotonic() < self.token_expires_at - self.token_refresh_margin:
+                return self.token
+            self.token = self.get_token()
+            return self.token
+
+    def close(self):
+        """Release the pooled connections held by the session and the custom field workers.
+
+        A closed client still works, so requests already using it can finish: the session opens
+        new connections as needed and custom fields are sent one at a time.
+        """
+        with self._pool_lock:
+            self._closed = True
+            executor, self._custom_field_executor = self._custom_field_executor, None
+        if executor is not None:
+            executor.shutdown()
+        self.session.close()
+
     def get_token(self):
         """Retrieve the access token from the Device42 authentication endpoint using Basic Authentication."""
         token_url = f"{self.host}/tauth/1.0/token/"
@@ -36,10 +641,11 @@ class Device42API:
         # Use HTTP Basic Auth to send client_id and client_secret in the Authorization header
         auth = HTTPBasicAuth(self.client_id, self.client_secret)
         # Send the data as form-encoded
-        response = requests.post(token_url, data=data, auth=auth, verify=self.ssl_verification)
+        response = self._request('POST', token_url, authenticate=False, data=data, auth=auth)
         if response.status_code == 200:
-            token = response.json().get("token")
-            return token
+            token_data = response.json()
+            self.token_expires_at = time.monotonic() + token_lifetime(token_data, self.token_lifetime)
+            return token_data.get("token")
         else:
             raise Exception(f"Error fetching token: {response.status_code} - {response.text}")
 
@@ -50,11 +656,12 @@ class Device42API:
             'Content-Type': 'application/json'
         }
 
+    @cached_lookup('id_by_name', 'Device')
     def device_id_by_name(self, name):
         """Get id of a device with the given name exists."""
         url = f"{self.host}{self.api_uri_prefix}/devices/"
         params = {"name": name}
-        response = requests.get(url, headers=self.get_headers(), params=params, verify=self.ssl_verification)
+        response = self._request('GET', url, headers=self.get_headers(), params=params)
         if response.status_code == 200:
             data = response.json()
             res = {}
@@ -67,11 +674,12 @@ class Device42API:
         return None
         # return self._process_response(response, "device")
 
+    @cached_lookup('id_by_name', 'Building')
     def building_id_by_name(self, name):
         """Get id of a building with the given name exists."""
         url = f"{self.host}{self.api_uri_prefix}/buildings/"
         params = {"name": name}
-        response = requests.get(url, headers=self.get_headers(), params=params, verify=self.ssl_verification)
+        response = self._request('GET', url, headers=self.get_headers(), params=params)
         if response.status_code == 200:
             data = response.json()
             for obj in data['buildings']:
@@ -82,11 +690,12 @@ class Device42API:
                         return None
         return None
 
+    @cached_lookup('id_by_name', 'Application')
     def application_id_by_name(self, name):
         """Get id of an application with the given name exists."""
         url = f"{self.host}{self.api_uri_prefix}/appcomps/"
         params = {"name": name}
-        response = requests.get(url, headers=self.get_headers(), params=params, verify=self.ssl_verification)
+        response = self._request('GET', url, headers=self.get_headers(), params=params)
         if response.status_code == 200:
             data = response.json()
             for obj in data['appcomps']:
@@ -98,11 +707,12 @@ class Device42API:
         return None
 
     #Customers is different than the other check by name functions it returns a list of customers without filtering
+    @cached_lookup('id_by_name', 'Customer')
     def customer_id_by_name(self, name):
         """Get id of a customer with the given name exists."""
         url = f"{self.host}{self.api_uri_prefix}/customers/"
         params = {"name": name}
-        response = requests.get(url, headers=self.get_headers(), params=params, verify=self.ssl_verification)
+        response = self._request('GET', url, headers=self.get_headers(), params=params)
         if response.status_code == 200:
             data = response.json()
             custs = data['Customers']
@@ -114,28 +724,32 @@ class Device42API:
                         return None
         return None
 
+    @cached_lookup('by_id', 'Device')
     def get_device_by_id(self, device_id):
         """Check if a device with the given ID exists."""
         url = f"{self.host}{self.api_uri_prefix}/devices/{device_id}/"
-        response = requests.get(url, headers=self.get_headers(), verify=self.ssl_verification)
+        response = self._request('GET', url, headers=self.get_headers())
         return self._process_response(response, "device")
 
+    @cached_lookup('by_id', 'Building')
     def get_building_by_id(self, building_id):
         """Check if a building with the given ID exists."""
         url = f"{self.host}{self.api_uri_prefix}/buildings/{building_id}/"
-        response = requests.get(url, headers=self.get_headers(), verify=self.ssl_verification)
+        response = self._request('GET', url, headers=self.get_headers())
         return self._process_response(response, "building")
 
+    @cached_lookup('by_id', 'Application')
     def get_application_by_id(self, application_id):
         """Check if an application with the given ID exists."""
         url = f"{self.host}{self.api_uri_prefix}/appcomps/{application_id}/"
-        response = requests.get(url, headers=self.get_headers(), verify=self.ssl_verification)
+        response = self._request('GET', url, headers=self.get_headers())
         return self._process_response(response, "application")
 
+    @cached_lookup('by_id', 'Customer')
     def get_customer_by_id(self, customer_id):
         """Check if a customer with the given ID exists."""
         url = f"{self.host}{self.api_uri_prefix}/customers/{customer_id}/"
-        response = requests.get(url, headers=self.get_headers(), verify=self.ssl_verification)
+        response = self._request('GET', url, headers=self.get_headers())
         return self._process_response(response, "customer")
 
     def _process_response(self, response, obj_type):
@@ -147,8 +761,77 @@ class Device42API:
                 return val
         return None
 
-    def check_existing(self, name, object_type):
-        """Check if an object with the given name exists in Device42 for multiple object types."""
+    def list_objects(self, object_type, params=None):
+        """Yield every record of an object type, paging through its list endpoint; `params` adds filters."""
+        url = self.get_endpoint_for_object_type(object_type)
+        offset = 0
+        first_id = None
+        while offset is not None:
+            response = self._request('GET', url, headers=self.get_headers(), params=self._page_params(params, offset))
+            page, offset, first_id = self._list_page(object_type, response, offset, first_id)
+            for obj in page:
+                yield obj
+
+    def build_index(self, object_types=None):
+        """Return an object_type -> {name: record} index built from one paged listing per type."""
+        object_types = LIST_RESPONSE_KEYS.keys() if object_types is None else object_types
+        return {object_type: self._name_index(self.list_objects(object_type))
+                for object_type in object_types if object_type in LIST_RESPONSE_KEYS}
+
+    def cached_index(self, object_types):
+        """Like build_index, but each type's index is kept in the lookup cache for cache_ttl seconds.
+
+        Lets the pages of one upload, and uploads close together, share one listing per type. An
+        import writing an object of a type drops that type's index.
+        """
+        if self.cache is None:
+            return self.build_index(object_types)
+        indexes = {}
+        for object_type in object_types:
+            if object_type not in LIST_RESPONSE_KEYS:
+                continue
+            key = ('index', object_type, None)
+            hit, index = self.cache.get(key)
+            if not hit:
+                index = self.lookups_in_flight.do(key, lambda: self.build_index([object_type])[object_type])
+                self.cache.set(key, index)
+            indexes[object_type] = index
+        return indexes
+
+    def prefetch(self, object_types=None, delta=False):
+        """Load a name -> record index for each object type so check_existing needs no HTTP calls.
+
+        By default every type the local snapshot doesn't already cover is listed; pass `delta`
+        when preparing a delta import, which only trusts the snapshot as check_existing does. The index is
+        kept on the client; shared clients should pass a build_index() result to check_existing
+        instead so concurrent uploads don't see each other's indexes.
+        """
+        self.prefetched.update(self.build_index(self._prefetch_types(object_types, delta)))
+
+    def clear_prefetch(self):
+        """Drop the prefetched indexes so lookups go back to the API."""
+        self.prefetched = {}
+
+    def refresh_snapshot(self, object_types=None, full=False):
+        """Sync the local snapshot from the appliance and return object_type -> records written."""
+        object_types = [object_type for object_type in object_types or LIST_RESPONSE_KEYS.keys()
+                        if object_type in LIST_RESPONSE_KEYS]
+        return self.snapshot.refresh(self, object_types, full=full,
+                                     incremental_types=self.snapshot_incremental_types,
+                                     incremental_param=self.snapshot_incremental_param,
+                                     skew_seconds=self.snapshot_skew_seconds)
+
+    def check_existing(self, name, object_type, index=None, delta=False):
+        """Check if an object with the given name exists in Device42 for multiple object types.
+
+        Lookups are answered from `index` (a build_index() result) or the prefetched index when
+        they cover the object type, then from the local snapshot, and otherwise from the API.
+        With `delta`, the snapshot is only used as snapshot_covers(object_type, delta=True) allows.
+        """
+        existing = self._local_existing(name, object_type, index, delta)
+        if existing is not None:
+            return existing
+
         if object_type == "Device":
             id = self.device_id_by_name(name)
             if id is not None:
@@ -179,140 +862,241 @@ class Device42API:
 
     def get_endpoint_for_object_type(self, object_type):
         """Return the correct API endpoint based on the object type."""
-        endpoints = {
-            "Device": f"{self.host}{self.api_uri_prefix}/devices/",
-            "Building": f"{self.host}{self.api_uri_prefix}/buildings/",
-            "Application": f"{self.host}{self.api_uri_prefix}/appcomps/",
-            "Customer": f"{self.host}{self.api_uri_prefix}/customers/",  # Customer endpoint
-        }
-        return endpoints.get(object_type, None)
+        plan = self.mapping_plan.for_type(object_type)
+        return plan.endpoint if plan else None
 
     def get_custom_field_endpoint(self, object_type, object_id):
         """Return the correct custom field API endpoint based on the object type."""
-        custom_field_endpoints = {
-            "Device": f"{self.host}{self.api_uri_prefix}/custom_fields/device/",
-            "Building": f"{self.host}{self.api_uri_prefix}/custom_fields/building/",
-            "Application": f"{self.host}{self.api_uri_prefix}/custom_fields/appcomp/",
-            "Customer": f"{self.host}{self.api_uri_prefix}/custom_fields/customer/",
-        }
-        return custom_field_endpoints.get(object_type, None)
+        plan = self.mapping_plan.for_type(object_type)
+        return plan.custom_field_endpoint if plan else None
 
     def set_custom_field_data(self, object_type, object_id, key, value):
         """Return the correct data to submit to the custom field API endpoint based on the object type."""
+        plan = self.mapping_plan.for_type(object_type)
+        return plan.custom_field_payload(object_id, key, value) if plan else {}
 
-        custom_field_data = {
-            "Device": {
-                "device_id": object_id,
-                "key": key,
-                "value": value
-            },
-            "Building": {
-                "id": object_id,
-                "key": key,
-                "value": value
-            },
-            "Application": {
-                "id": object_id,
-                "key": key,
-                "value": value
-            },
-            "Customer": {
-                "id": object_id,
-                "key": key,
-                "value": value
-            }
-        }
-        return custom_field_data.get(object_type, {})
+    def bulk_import(self, devices, endpoint, object_type, result=None):
+        """Send a list of devices (or other objects) to the Device42 API for bulk import as form data.
 
-    def bulk_import(self, devices, endpoint, object_type):
-        """Send a list of devices (or other objects) to the Device42 API for bulk import as form data."""
+        Custom field outcomes and per-phase timings are recorded on `result` (a RowResult) when one is given.
+        """
         headers = {
             'Authorization': f'Bearer {self.token}'  # Add token to the header
         }
 
         # Step 1: Send the standard fields to the device endpoint
-        standard_fields = {field: value for field, value in devices[0].items() if field in self.csv_mappings.keys()}
-        response = requests.post(endpoint, data=standard_fields, headers=headers, verify=self.ssl_verification)
+        standard_fields = self._standard_fields(devices[0])
+        started = time.perf_counter()
+        response = self._request('POST', endpoint, data=standard_fields, headers=headers)
+        self._record_phase('create', time.perf_counter() - started, result)
         if response.status_code == 200:
             # Object (device, customer, etc.) created or updated successfully
-            print(f"{object_type} import successful: {devices[0]['name']}")
-
             # Step 2: Update custom fields for the object
             object_id = response.json().get("msg")[1]  # Get the object ID from the response
+            if result is not None:
+                result.object_id = object_id
             if object_id:
-                custom_field_endpoint = self.get_custom_field_endpoint(object_type, object_id)
-
                 # Prepare custom fields based on object type
-                custom_fields_for_type = self.custom_fields.get(object_type.lower(), {})
-                # print(custom_fields_for_type)
-                for csv_field, device42_field in custom_fields_for_type.items():
-                    # print(devices[0], csv_field)
-                    if devices[0].get(csv_field):
-                        custom_field_data = self.set_custom_field_data(object_type, object_id, csv_field, devices[0][csv_field])
-
-                        # Send the custom field update
-                        # print(custom_field_endpoint, custom_field_data)
-                        custom_field_response = requests.put(custom_field_endpoint, data=custom_field_data, headers=headers, verify=self.ssl_verification)
-                        # print(custom_field_response.json())
-                        # pprint(json.loads(custom_field_response.text))
-                        if custom_field_response.status_code == 200:
-                            print(f"Custom field '{device42_field}' update successful for {object_type} {object_id}")
-                        else:
-                            print(f"Error updating custom field '{csv_field}' for {object_type} {object_id}: {custom_field_response.status_code} - {custom_field_response.text}")
-        else:
-            # Print error if the object creation/update fails
-            print(f"Error importing {object_type}: {response.status_code} - {response.text}")
+                fields = self.mapping_plan.for_type(object_type).custom_field_values(devices[0])
+                started = time.perf_counter()
+                self.update_custom_fields(object_type, object_id, fields, result)
+                self._record_phase('custom_fields', time.perf_counter() - started, result)
+
+            # The object changed, so cached lookups for it are stale
+            if self.cache is not None:
+                self.cache.invalidate_object(object_type, devices[0].get('name'), object_id)
 
         return response
 
+    def update_custom_fields(self, object_type, object_id, fields, result=None):
+        """Set several custom fields on one object, batched into a single PUT where supported.
+
+        Object types listed in `import.batch_custom_fields` get one `bulk_fields` request; the
+        others, or a batch the appliance rejects, fall back to one PUT per field sent concurrently.
+        """
+        if not fields:
+            return
+        headers = {
+            'Authorization': f'Bearer {self.token}'
+        }
+        plan = self.mapping_plan.for_type(object_type)
+        custom_field_endpoint = plan.custom_field_endpoint
+
+        custom_field_data = self._bulk_fields_payload(object_type, object_id, fields)
+        if custom_field_data is not None:
+            response = self._request('PUT', custom_field_endpoint, data=custom_field_data, headers=headers)
+            if response.status_code == 200:
+                for csv_field in fields:
+                    self._record_custom_field(result, object_type, csv_field, response)
+                return
+
+        def put_field(csv_field):
+            custom_field_data = plan.custom_field_payload(object_id, csv_field, fields[csv_field])
+            return csv_field, self._request('PUT', custom_field_endpoint, data=custom_field_data, headers=headers)
+
+        responses = None
+        pool = self._custom_field_pool() if len(fields) > 1 and self.custom_field_workers > 1 else None
+        if pool is not None:
+            try:
+                responses = pool.map(put_field, fields)
+            except RuntimeError:
+                pass  # The client was closed after the pool was taken
+        if responses is None:
+            responses = map(put_field, fields)
+        for csv_field, response in responses:
+            self._record_custom_field(result, object_type, csv_field, response)
+
+    def _custom_field_pool(self):
+        """Return the thread pool used for per-field custom field PUTs, creating it on first use.
+
+        Returns None once the client is closed.
+        """
+        with self._pool_lock:
+            if self._custom_field_executor is None and not self._closed:
+                self._custom_field_executor = ThreadPoolExecutor(max_workers=self.custom_field_workers)
+            return self._custom_field_executor
+
+    def validate_csv(self, csv_file):
+        """Validate a whole open CSV file without any HTTP traffic and return a ValidationResult."""
+        return self.validator.validate(csv_file)
+
     def pre_check_csv(self, csv_file):
         """Pre-check the CSV data for required fields and return issues if found."""
-        csv_reader = csv.DictReader(csv_file)
-        issues = []
-        for row_num, row in enumerate(csv_reader, start=1):
-            # If there are required fields, check them; otherwise skip this step
-            if self.required_fields:
-                for field in self.required_fields:
-                    csv_field = self.csv_mappings.get(field)
-                    if not row.get(csv_field):
-                        issues.append(f"Row {row_num}: Missing or empty required field '{field}'.")
-
-            # Check if object_type exists in each row
-            object_type = row.get(self.csv_mappings['object_type'])
-            if not object_type:
-                issues.append(f"Row {row_num}: Missing or invalid 'ObjectType' field.")
-
-        return issues
-    def import_from_csv(self, csv_data):
-        """Process a single row or a list of rows for import."""
-        if isinstance(csv_data, list):
-            # Iterate over the list of rows and import each one
-            for row in csv_data:
-                self.process_row(row)
+        return [str(issue) for issue in self.validate_csv(csv_file).issues]
+
+    def import_from_csv(self, csv_data, workers=None, report=None, dependency_order=None, chunk_size=None,
+                        delta=None, journal=None, coalesce=None, numbered=False):
+        """Import a single row, a list of rows or any iterator of rows and return an ImportReport.
+
+        Rows are read `chunk_size` at a time and the next chunk is only read once the current
+        one has finished, so memory stays bounded for iterators such as a csv.DictReader.
+        With `dependency_order` each chunk is imported in waves so that referenced Customers,
+        Buildings and Applications exist before the rows that name them. With more than one
+        worker, each wave is sent concurrently with at most `max_in_flight` rows outstanding;
+        rows for the same object type and name still run in file order. With `delta`, rows
+        are compared with the existing object and only changed fields are sent. With a `journal`
+        (an ImportJournal), completed rows are checkpointed and rows already in it are skipped.
+        With `coalesce` ('merge', 'last' or 'none'; default import.coalesce), rows in a chunk for the
+        same object type and name are combined and sent once; each of them is still reported.
+        With `numbered`, `csv_data` yields (row_num, row) pairs, e.g. one shard of a larger file.
+        """
+        report, delta, waves = self._plan_import(csv_data, report, dependency_order, chunk_size, delta, coalesce,
+                                                 numbered)
+        workers = workers or self.workers
+        executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            for wave, duplicates in waves:
+                if executor is None:
+                    for row_num, row in wave:
+                        self._report_row(report, row, row_num, delta, journal, duplicates.get(row_num, ()))
+                else:
+                    # Each wave must finish before the rows that reference it are sent
+                    self._import_wave(executor, wave, self.max_in_flight or workers * 2, report, delta,
+                                      journal, duplicates)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        return report
+
+    def _import_wave(self, executor, numbered_rows, max_in_flight, report, delta=False, journal=None,
+                     duplicates=None):
+        """Send (row_num, row) pairs through the executor and wait for all of them to finish.
+
+        An exception from a row (e.g. a failing journal write or report listener) stops the wave
+        and is raised here, as it would be with a single worker.
+        """
+        pending = set()
+        last_for_key = {}  # (object_type, name) -> future of the latest row for that object
+        try:
+            for row_num, row in numbered_rows:
+                # Keep at most max_in_flight rows outstanding so the appliance isn't flooded
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                    last_for_key = {key: future for key, future in last_for_key.items() if not future.done()}
+
+                # A later row for the same object must not overtake an earlier one
+                key = self._row_key(row)
+                previous = last_for_key.get(key)
+                if previous is not None:
+                    previous.result()
+
+                future = executor.submit(self._report_row, report, row, row_num, delta, journal,
+                                         (duplicates or {}).get(row_num, ()))
+                pending.add(future)
+                last_for_key[key] = future
+            done, pending = wait(pending)
+            for future in done:
+                future.result()
+        except BaseException:
+            # Rows not started yet are dropped; the ones already running finish before shutdown
+            for future in pending:
+                future.cancel()
+            raise
+
+    def _report_row(self, report, row, row_num, delta=False, journal=None, duplicates=()):
+        """Process one row, checkpoint it in the journal if there is one, and add its result to the report."""
+        key, entry = self._journal_entry(journal, row, row_num)
+        if entry is None:
+            result = self._safe_process_row(row, row_num, delta)
         else:
-            # Single row processing
-            self.process_row(csv_data)
-
-    def process_row(self, row):
-        """Process a single row of CSV data and send it to the appropriate API endpoint."""
-        object_type = row.pop(self.csv_mappings['object_type'], None)
-        endpoint = self.get_endpoint_for_object_type(object_type)
-        
-        if endpoint is None:
-            print(f"Skipping unsupported object type: {object_type}")
-            return
-        
-        device = {}
-        # Dynamically map CSV columns to API fields based on config.yaml, excluding object_type
-        for api_field, csv_column in self.csv_mappings.items():
-            if csv_column in row and api_field != 'object_type':  # Ensure object_type is not included
-                device[api_field] = row[csv_column]
-        
+            result = self._resume_row(row, row_num, *entry)
+        self._finish_row(report, result, journal, key, entry, duplicates)
+
+    def _resume_row(self, row, row_num, object_id, failed_custom_fields):
+        """Build the result for a row the journal says is committed, retrying its failed custom fields."""
+        result, fields = self._resumed_row(row, row_num, object_id, failed_custom_fields)
+        if fields:
+            try:
+                self.update_custom_fields(result.object_type, object_id, fields, result)
+            except Exception as e:
+                self._mark_failed(result, e)
+        return result
+
+    def _safe_process_row(self, row, row_num, delta=False):
+        """Run process_row, turning unexpected exceptions into a failed RowResult."""
+        try:
+            return self.process_row(row, row_num, delta)
+        except Exception as e:
+            return self._failed_row(row, row_num, e)
+
+    def process_row(self, row, row_num=None, delta=False):
+        """Process a single row of CSV data, send it to the appropriate API endpoint and return a RowResult.
+
+        With `delta`, the row is compared with the existing object first: unchanged objects are
+        not sent at all, and for changed ones only the name and the changed fields are sent.
+        """
+        result, type_plan, device = self._start_row(row, row_num)
+        if type_plan is None:
+            return result
+        object_type = result.object_type
+
+        if delta:
+            started = time.perf_counter()
+            existing = self.check_existing(device.get('name'), object_type, delta=True)
+            self._record_phase('lookup', time.perf_counter() - started, result)
+            record = existing.get('data') if existing else None
+            if record:
+                return self._import_delta(device, record, type_plan.endpoint, object_type, result)
+            if existing is not None:
+                result.action = RowResult.CREATED
+
         # Call the bulk import for the specific object type and endpoint
-        response = self.bulk_import([device], endpoint, object_type)
+        response = self.bulk_import([device], type_plan.endpoint, object_type, result)
+        return self._record_response(result, response)
 
-        # Check response status
-        if response.status_code == 200:
-            print(f"Successfully imported {object_type}: {row.get(self.csv_mappings['name'])}")
-        else:
-            print(f"Error importing {object_type}: {response.status_code} - {response.text}")
+    def _import_delta(self, device, record, endpoint, object_type, result):
+        """Send only the fields of `device` that differ from the existing Device42 `record`."""
+        changed, changed_custom = self._plan_delta(device, record, object_type, result)
+        if changed is not None:
+            response = self.bulk_import([changed], endpoint, object_type, result)
+            return self._record_response(result, response)
+        if changed_custom:
+            started = time.perf_counter()
+            self.update_custom_fields(object_type, result.object_id, changed_custom, result)
+            self._record_phase('custom_fields', time.perf_counter() - started, result)
+            result.status_code = 200
+            if self.cache is not None:
+                self.cache.invalidate_object(object_type, device['name'], result.object_id)
+        return result
@@ -0,0 +1,381 @@
+import asyncio
+import json
+import time
+
+import aiohttp
+
+from device42_api import LIST_RESPONSE_KEYS, BaseDevice42API, token_lifetime
+from import_report import RowResult
+
+
+class ApiResponse:
+    """A fully read response with the parts of requests.Response the import code uses."""
+
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.content = body
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncDevice42API(BaseDevice42API):
+    """asyncio counterpart of Device42API for services that already run an event loop.
+
+    It reads config.yaml and decides what to send for each row with the same BaseDevice42API
+    code as Device42API, so only the I/O differs. Requests go through
+    one pooled aiohttp session, and a semaphore (`async_client.max_concurrency`) caps how many
+    are in flight, so a single event loop can keep hundreds of requests going without threads.
+
+    Use it as an async context manager, or call `close()` when done:
+
+        async with AsyncDevice42API('config.yaml') as api:
+            report = await api.import_from_csv(csv.DictReader(csv_file))
+    """
+
+    def __init__(self, config_file, cache=None):
+        super().__init__(config_file, cache)
+        self._lookups_in_flight = {}  # cache key -> task of the lookup in flight
+
+        # Async client settings, all optional
+        async_config = self.config.get('async_client', {}) or {}
+        self.max_concurrency = async_config.get('max_concurrency', 100)
+        self.pool_maxsize = async_config.get('pool_maxsize', self.max_concurrency)
+        # Rows in progress at once; each row has at most a few requests outstanding
+        self.max_in_flight = async_config.get('max_in_flight', self.max_concurrency)
+
+        # Retries of 429/5xx and connection errors are made by _send
+        self.timeout = aiohttp.ClientTimeout(sock_connect=self.http_config.get('connect_timeout', 5),
+                                             sock_read=self.http_config.get('read_timeout', 60))
+        self.keep_alive = self.http_config.get('keep_alive', True)
+
+        # Created on first use, inside the event loop that will run the requests
+        self.session = None
+        self._semaphore = None
+        self._token_lock = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, traceback):
+        await self.close()
+
+    async def open(self):
+        """Create the pooled session and fetch a token."""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize, ssl=None if self.ssl_verification else False,
+                                             force_close=not self.keep_alive)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._token_lock = asyncio.Lock()
+        await self.current_token()
+
+    async def close(self):
+        """Close the session and its pooled connections."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, method, url, authenticate=True, **kwargs):
+        """Send a request with the current bearer token; a 401 refreshes the token and retries once."""
+        if self.session is None:
+            await self.open()
+        if not authenticate:
+            return await self._send(method, url, **kwargs)
+
+        headers = dict(kwargs.pop('headers', None) or {})
+        token = await self.current_token()
+        headers['Authorization'] = f"Bearer {token}"
+        response = await self._send(method, url, headers=headers, **kwargs)
+        if response.status_code == 401:
+            self.metrics.observe_retry(method, url)
+            headers['Authorization'] = f"Bearer {await self.refresh_token(token)}"
+            response = await self._send(method, url, headers=headers, **kwargs)
+        return response
+
+    async def _send(self, method, url, **kwargs):
+        """Send one request within the rate limit and the concurrency semaphore, retrying 429/5xx and errors.
+
+        Retries back off `backoff_factor * 2 ** attempt` seconds, or the server's Retry-After
+        when it gives one, as in Device42API._send.
+        """
+        started = time.perf_counter()
+        retried = 0
+        while True:
+            if self.rate_limiter is not None:
+                wait = self.rate_limiter.try_acquire()
+                while wait:
+                    await asyncio.sleep(wait)
+                    wait = self.rate_limiter.try_acquire()
+            try:
+                async with self._semaphore:
+                    async with self.session.request(method, url, **kwargs) as raw:
+                        response = ApiResponse(raw.status, await raw.read(), raw.headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if retried >= self.max_retries:
+                    self.metrics.observe_request(method, url, time.perf_counter() - started, retries=retried, error=e)
+                    raise
+                delay = self._retry_delay(retried)
+            else:
+                if response.status_code not in self.retry_statuses or retried >= self.max_retries:
+                    self.metrics.observe_request(method, url, time.perf_counter() - started, response.status_code,
+                                                 retried)
+                    return response
+                delay = self._retry_delay(retried, response)
+            retried += 1
+            await asyncio.sleep(delay)
+
+    async def current_token(self):
+        """Return a token that is valid for at least refresh_margin more seconds."""
+        if self.token is not None and time.monotonic() < self.token_expires_at - self.token_refresh_margin:
+            return self.token
+        return await self.refresh_token(self.token)
+
+    async def refresh_token(self, stale_token):
+        """Fetch a new token unless another task already replaced `stale_token`."""
+        async with self._token_lock:
+            if self.token != stale_token and time.monotonic() < self.token_expires_at - self.token_refresh_margin:
+                return self.token
+            self.token = await self.get_token()
+            return self.token
+
+    async def get_token(self):
+        """Retrieve an access token from the Device42 authentication endpoint using Basic Authentication."""
+        token_url = f"{self.host}/tauth/1.0/token/"
+        response = await self._request('POST', token_url, authenticate=False,
+                                       data={"grant_type": "client_credentials"},
+                                       auth=aiohttp.BasicAuth(self.client_id, self.client_secret))
+        if response.status_code == 200:
+            token_data = response.json()
+            self.token_expires_at = time.monotonic() + token_lifetime(token_data, self.token_lifetime)
+            return token_data.get("token")
+        raise Exception(f"Error fetching token: {response.status_code} - {response.text}")
+
+    async def _single_flight(self, key, load):
+        """Await load(), or the lookup for `key` another task already has in flight."""
+        task = self._lookups_in_flight.get(key)
+        if task is None:
+            task = self._lookups_in_flight[key] = asyncio.ensure_future(load())
+            task.add_done_callback(lambda _: self._lookups_in_flight.pop(key, None))
+        # Shielded so one caller being cancelled doesn't cancel the lookup for the others
+        return await asyncio.shield(task)
+
+    async def id_by_name(self, object_type, name):
+        """Return the ID of the object with this name, or None; cached like Device42API's *_id_by_name."""
+        key = ('id_by_name', object_type, name)
+        if self.cache is not None:
+            hit, cached = self.cache.get(key)
+            if hit:
+                return cached
+        object_id = await self._single_flight(key, lambda: self._fetch_id_by_name(object_type, name))
+        if object_id is not None and self.cache is not None:
+            self.cache.set(key, object_id)
+        return object_id
+
+    async def _fetch_id_by_name(self, object_type, name):
+        list_key, id_field, _ = LIST_RESPONSE_KEYS[object_type]
+        response = await self._request('GET', self.mapping_plan.for_type(object_type).endpoint,
+                                       params={"name": name})
+        object_id = None
+        if response.status_code == 200:
+            # Customers ignore the name filter, so every endpoint's results are matched by name here
+            for obj in response.json().get(list_key) or []:
+                if obj.get('name') == name:
+                    object_id = obj.get(id_field)
+                    break
+        return object_id
+
+    async def get_by_id(self, object_type, object_id):
+        """Return {"type": ..., "data": record} for an object ID, or None; cached like Device42API's get_*_by_id."""
+        key = ('by_id', object_type, object_id)
+        if self.cache is not None:
+            hit, cached = self.cache.get(key)
+            if hit:
+                return cached
+        result = await self._single_flight(key, lambda: self._fetch_by_id(object_type, object_id))
+        if result is not None and self.cache is not None:
+            self.cache.set(key, result)
+        return result
+
+    async def _fetch_by_id(self, object_type, object_id):
+        response = await self._request('GET', f"{self.mapping_plan.for_type(object_type).endpoint}{object_id}/")
+        result = None
+        if response.status_code == 200:
+            data = response.json()
+            if data:
+                result = {"type": LIST_RESPONSE_KEYS[object_type][2], "data": data}
+        return result
+
+    async def list_objects(self, object_type, params=None):
+        """Return every record of an object type, paging through its list endpoint."""
+        url = self.mapping_plan.for_type(object_type).endpoint
+        records = []
+        offset = 0
+        first_id = None
+        while offset is not None:
+            response = await self._request('GET', url, params=self._page_params(params, offset))
+            page, offset, first_id = self._list_page(object_type, response, offset, first_id)
+            records.extend(page)
+        return records
+
+    async def build_index(self, object_types=None):
+        """Return an object_type -> {name: record} index, listing the object types concurrently."""
+        object_types = [object_type for object_type in
+                        (LIST_RESPONSE_KEYS.keys() if object_types is None else object_types)
+                        if object_type in LIST_RESPONSE_KEYS]
+        listings = await asyncio.gather(*(self.list_objects(object_type) for object_type in object_types))
+        return {object_type: self._name_index(records) for object_type, records in zip(object_types, listings)}
+
+    async def prefetch(self, object_types=None, delta=False):
+        """Load a name -> record index for each object type so check_existing needs no HTTP calls."""
+        self.prefetched.update(await self.build_index(self._prefetch_types(object_types, delta)))
+
+    async def check_existing(self, name, object_type, index=None, delta=False):
+        """Look an object up by name: from `index` or the prefetched index, then the snapshot, then the API."""
+        existing = self._local_existing(name, object_type, index, delta)
+        if existing is not None or object_type not in LIST_RESPONSE_KEYS:
+            return existing
+        object_id = await self.id_by_name(object_type, name)
+        if object_id is None:
+            return {"type": object_type, "data": {}}
+        return await self.get_by_id(object_type, object_id)
+
+    async def bulk_import(self, devices, endpoint, object_type, result=None):
+        """Create or update one object, then set its custom fields; see Device42API.bulk_import."""
+        standard_fields = self._standard_fields(devices[0])
+        started = time.perf_counter()
+        response = await self._request('POST', endpoint, data=standard_fields)
+        self._record_phase('create', time.perf_counter() - started, result)
+        if response.status_code == 200:
+            object_id = response.json().get("msg")[1]
+            if result is not None:
+                result.object_id = object_id
+            if object_id:
+                fields = self.mapping_plan.for_type(object_type).custom_field_values(devices[0])
+                started = time.perf_counter()
+                await self.update_custom_fields(object_type, object_id, fields, result)
+                self._record_phase('custom_fields', time.perf_counter() - started, result)
+            if self.cache is not None:
+                self.cache.invalidate_object(object_type, devices[0].get('name'), object_id)
+        return response
+
+    async def update_custom_fields(self, object_type, object_id, fields, result=None):
+        """Set several custom fields on one object: one bulk_fields PUT where supported, else concurrent PUTs."""
+        if not fields:
+            return
+        plan = self.mapping_plan.for_type(object_type)
+        custom_field_data = self._bulk_fields_payload(object_type, object_id, fields)
+        if custom_field_data is not None:
+            response = await self._request('PUT', plan.custom_field_endpoint, data=custom_field_data)
+            if response.status_code == 200:
+                for csv_field in fields:
+                    self._record_custom_field(result, object_type, csv_field, response)
+                return
+
+        responses = await asyncio.gather(*(
+            self._request('PUT', plan.custom_field_endpoint,
+                          data=plan.custom_field_payload(object_id, csv_field, value))
+            for csv_field, value in fields.items()))
+        for csv_field, response in zip(fields, responses):
+            self._record_custom_field(result, object_type, csv_field, response)
+
+    async def import_from_csv(self, csv_data, report=None, dependency_order=None, chunk_size=None, delta=None,
+                              journal=None, max_in_flight=None, coalesce=None, numbered=False):
+        """Import rows (a single row or an iterable of rows) and return an ImportReport.
+
+        Works like Device42API.import_from_csv, with up to `max_in_flight` rows in progress as
+        tasks on the event loop instead of threads.
+        """
+        report, delta, waves = self._plan_import(csv_data, report, dependency_order, chunk_size, delta, coalesce,
+                                                 numbered)
+        max_in_flight = max_in_flight or self.max_in_flight
+        for wave, duplicates in waves:
+            # Each wave must finish before the rows that reference it are sent
+            await self._import_wave(wave, max_in_flight, report, delta, journal, duplicates)
+        return report
+
+    async def _import_wave(self, numbered_rows, max_in_flight, report, delta=False, journal=None, duplicates=None):
+        """Import (row_num, row) pairs with up to `max_in_flight` rows in progress at once.
+
+        Rows for the same object are chained so they still run in file order.
+        """
+        chains = {}
+        for row_num, row in numbered_rows:
+            chains.setdefault(self._row_key(row), []).append((row_num, row))
+        pending = iter(chains.values())
+
+        async def worker():
+            # All workers share one iterator; taking from it never awaits, so no chain is taken twice
+            for chain in pending:
+                for row_num, row in chain:
+                    await self._report_row(report, row, row_num, delta, journal, (duplicates or {}).get(row_num, ()))
+
+        await asyncio.gather(*(worker() for _ in range(min(max_in_flight, len(chains)))))
+
+    async def _report_row(self, report, row, row_num, delta=False, journal=None, duplicates=()):
+        """Process one row, checkpoint it in the journal if there is one, and add its result to the report."""
+        # The journal is a local SQLite file; its lookups and writes are short enough to run inline
+        key, entry = self._journal_entry(journal, row, row_num)
+        if entry is None:
+            result = await self._safe_process_row(row, row_num, delta)
+        else:
+            result = await self._resume_row(row, row_num, *entry)
+        self._finish_row(report, result, journal, key, entry, duplicates)
+
+    async def _resume_row(self, row, row_num, object_id, failed_custom_fields):
+        """Build the result for a row the journal says is committed, retrying its failed custom fields."""
+        result, fields = self._resumed_row(row, row_num, object_id, failed_custom_fields)
+        if fields:
+            try:
+                await self.update_custom_fields(result.object_type, object_id, fields, result)
+            except Exception as e:
+                self._mark_failed(result, e)
+        return result
+
+    async def _safe_process_row(self, row, row_num, delta=False):
+        """Run process_row, turning unexpected exceptions into a failed RowResult."""
+        try:
+            return await self.process_row(row, row_num, delta)
+        except Exception as e:
+            return self._failed_row(row, row_num, e)
+
+    async def process_row(self, row, row_num=None, delta=False):
+        """Send a single CSV row to the appropriate endpoint and return a RowResult; see Device42API.process_row."""
+        result, type_plan, device = self._start_row(row, row_num)
+        if type_plan is None:
+            return result
+        object_type = result.object_type
+
+        if delta:
+            started = time.perf_counter()
+            existing = await self.check_existing(device.get('name'), object_type, delta=True)
+            self._record_phase('lookup', time.perf_counter() - started, result)
+            record = existing.get('data') if existing else None
+            if record:
+                return await self._import_delta(device, record, type_plan.endpoint, object_type, result)
+            if existing is not None:
+                result.action = RowResult.CREATED
+
+        response = await self.bulk_import([device], type_plan.endpoint, object_type, result)
+        return self._record_response(result, response)
+
+    async def _import_delta(self, device, record, endpoint, object_type, result):
+        """Send only the fields of `device` that differ from the existing Device42 `record`."""
+        changed, changed_custom = self._plan_delta(device, record, object_type, result)
+        if changed is not None:
+            response = await self.bulk_import([changed], endpoint, object_type, result)
+            return self._record_response(result, response)
+        if changed_custom:
+            started = time.perf_counter()
+            await self.update_custom_fields(object_type, result.object_id, changed_custom, result)
+            self._record_phase('custom_fields', time.perf_counter() - started, result)
+            result.status_code = 200
+            if self.cache is not None:
+                self.cache.invalidate_object(object_type, device['name'], result.object_id)
+        return result
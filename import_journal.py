@@ -0,0 +1,72 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def row_hash(row_num, row):
+    """Return a stable hash of a row's position and content."""
+    content = json.dumps([row_num, sorted(row.items())], default=str)
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+class ImportJournal:
+    """SQLite checkpoint journal of completed rows so an interrupted import can be resumed.
+
+    Each finished row is recorded with its hash, the object ID Device42 returned and the
+    custom fields that failed. On resume, rows whose object and custom fields were all
+    written are skipped, and rows with failed custom fields only retry those fields.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Rows finish on worker threads; one shared connection behind a lock serializes the writes
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # A commit per row must stay cheap; WAL with NORMAL sync only fsyncs at checkpoints
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS completed_rows (
+                    row_hash TEXT PRIMARY KEY,
+                    row_num INTEGER,
+                    object_type TEXT,
+                    name TEXT,
+                    object_id TEXT,
+                    failed_custom_fields TEXT NOT NULL,
+                    completed_at REAL NOT NULL
+                )""")
+
+    def lookup(self, row_hash):
+        """Return (object_id, failed custom field keys) for a committed row, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT object_id, failed_custom_fields FROM completed_rows WHERE row_hash = ?",
+                (row_hash,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def record(self, row_hash, result, failed_custom_fields):
+        """Record a row whose object was written; `failed_custom_fields` are the keys still to send."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO completed_rows "
+                "(row_hash, row_num, object_type, name, object_id, failed_custom_fields, completed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (row_hash, result.row_num, result.object_type, result.name,
+                 None if result.object_id is None else str(result.object_id),
+                 json.dumps(sorted(failed_custom_fields)), time.time()))
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM completed_rows").fetchone()[0]
+
+    def clear(self):
+        """Forget every completed row, e.g. when starting a fresh run."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM completed_rows")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,258 @@
+import re
+import threading
+import time
+from urllib.parse import urlsplit
+
+# Upper bounds in seconds; wide enough to separate a pooled GET from a slow custom field PUT
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_label(url):
+    """Return the path of a URL with numeric IDs replaced, so each endpoint is one label value."""
+    return _ID_SEGMENT.sub('/{id}', urlsplit(url).path)
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in the Prometheus layout."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # The last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def add(self, other):
+        """Fold another histogram with the same buckets into this one."""
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.sum += other.sum
+        self.count += other.count
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating within its bucket, as Prometheus' histogram_quantile does."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= rank:
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return self.buckets[-1]  # Beyond the last bucket; its bound is the best estimate there is
+
+
+class ImportMetrics:
+    """Thread-safe request, phase and throughput metrics for one Device42API client.
+
+    Requests are keyed by method and endpoint (`endpoint_label`). Errors count exceptions and
+    responses with a 4xx/5xx status. Retries count both the session's 429/5xx retries and
+    requests re-sent after a 401. Phases are the lookup, create and custom_fields timings
+    recorded on rows.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS, clock=time.monotonic):
+        self.buckets = tuple(buckets)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.latency = {}  # (method, endpoint) -> Histogram
+        self.responses = {}  # (method, endpoint, status) -> count
+        self.errors = {}  # (method, endpoint, error) -> count
+        self.retries = {}  # (method, endpoint) -> count
+        self.phases = {}  # phase -> Histogram
+        self.rows = {}  # row status -> count
+        self.started_at = None
+        self.last_row_at = None
+
+    def observe_request(self, method, url, seconds, status_code=None, retries=0, error=None):
+        """Record one request; `error` is the exception raised, if any."""
+        key = (method, endpoint_label(url))
+        with self._lock:
+            histogram = self.latency.get(key)
+            if histogram is None:
+                histogram = self.latency[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+            if status_code is not None:
+                status_key = key + (str(status_code),)
+                self.responses[status_key] = self.responses.get(status_key, 0) + 1
+            if error is not None or (status_code is not None and status_code >= 400):
+                error_key = key + (type(error).__name__ if error is not None else str(status_code),)
+                self.errors[error_key] = self.errors.get(error_key, 0) + 1
+            if retries:
+                self.retries[key] = self.retries.get(key, 0) + retries
+
+    def observe_retry(self, method, url):
+        """Record a request re-sent by the client itself, e.g. after a 401."""
+        key = (method, endpoint_label(url))
+        with self._lock:
+            self.retries[key] = self.retries.get(key, 0) + 1
+
+    def observe_phase(self, phase, seconds):
+        with self._lock:
+            histogram = self.phases.get(phase)
+            if histogram is None:
+                histogram = self.phases[phase] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def import_started(self):
+        """Mark the start of the first import, from which rows per second is measured."""
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = self._clock()
+
+    def observe_row(self, status):
+        with self._lock:
+            self.rows[status] = self.rows.get(status, 0) + 1
+            self.last_row_at = self._clock()
+
+    def merge(self, other):
+        """Fold another client's metrics into these, e.g. from a worker process.
+
+        Start and finish times are compared directly, which holds for time.monotonic across
+        processes on one host.
+        """
+        with other._lock:
+            latency = dict(other.latency)
+            phases = dict(other.phases)
+            counters = [(self.responses, dict(other.responses)), (self.errors, dict(other.errors)),
+                        (self.retries, dict(other.retries)), (self.rows, dict(other.rows))]
+            started_at, last_row_at = other.started_at, other.last_row_at
+        with self._lock:
+            for mine, theirs in ((self.latency, latency), (self.phases, phases)):
+                for key, histogram in theirs.items():
+                    if key not in mine:
+                        mine[key] = Histogram(self.buckets)
+                    mine[key].add(histogram)
+            for mine, theirs in counters:
+                for key, count in theirs.items():
+                    mine[key] = mine.get(key, 0) + count
+            if started_at is not None:
+                self.started_at = started_at if self.started_at is None else min(self.started_at, started_at)
+            if last_row_at is not None:
+                self.last_row_at = last_row_at if self.last_row_at is None else max(self.last_row_at, last_row_at)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def rows_per_second(self):
+        """Return rows finished per second between the first import starting and the last row finishing."""
+        with self._lock:
+            if self.started_at is None or self.last_row_at is None or self.last_row_at <= self.started_at:
+                return 0.0
+            return sum(self.rows.values()) / (self.last_row_at - self.started_at)
+
+    def request_stats(self):
+        """Return one dict per (method, endpoint), slowest total time first."""
+        with self._lock:
+            stats = []
+            for (method, endpoint), histogram in self.latency.items():
+                stats.append({
+                    "method": method,
+                    "endpoint": endpoint,
+                    "calls": histogram.count,
+                    "errors": sum(count for key, count in self.errors.items() if key[:2] == (method, endpoint)),
+                    "retries": self.retries.get((method, endpoint), 0),
+                    "total": histogram.sum,
+                    "p50": histogram.quantile(0.5),
+                    "p99": histogram.quantile(0.99),
+                })
+        return sorted(stats, key=lambda stat: stat["total"], reverse=True)
+
+    def phase_stats(self):
+        """Return one dict per phase with its count, total time and estimated p50/p99."""
+        with self._lock:
+            return [{"phase": phase, "count": histogram.count, "total": histogram.sum,
+                     "p50": histogram.quantile(0.5), "p99": histogram.quantile(0.99)}
+                    for phase, histogram in self.phases.items()]
+
+    def to_dict(self):
+        """Return request, phase and row stats as a plain dict, e.g. for JSON."""
+        with self._lock:
+            overall = Histogram(self.buckets)
+            for histogram in self.latency.values():
+                overall.add(histogram)
+            rows = dict(self.rows)
+        return {
+            "requests": self.request_stats(),
+            "all_requests": {"calls": overall.count, "total": overall.sum,
+                             "p50": overall.quantile(0.5), "p99": overall.quantile(0.99)},
+            "phases": self.phase_stats(),
+            "rows": rows,
+            "rows_per_second": self.rows_per_second(),
+        }
+
+    def render(self, gauges=None):
+        """Return every metric in the Prometheus text exposition format.
+
+        `gauges` maps extra gauge names to (help text, value), for state the client owns.
+        """
+        lines = []
+        with self._lock:
+            self._render_histograms(lines, 'device42_request_duration_seconds', 'Device42 API request latency.',
+                                    {(('method', method), ('endpoint', endpoint)): histogram
+                                     for (method, endpoint), histogram in self.latency.items()})
+            self._render_counter(lines, 'device42_requests_total', 'Device42 API responses by status.',
+                                 {(('method', method), ('endpoint', endpoint), ('status', status)): count
+                                  for (method, endpoint, status), count in self.responses.items()})
+            self._render_counter(lines, 'device42_request_errors_total',
+                                 'Device42 API requests that raised or returned a 4xx/5xx status.',
+                                 {(('method', method), ('endpoint', endpoint), ('error', error)): count
+                                  for (method, endpoint, error), count in self.errors.items()})
+            self._render_counter(lines, 'device42_request_retries_total',
+                                 'Device42 API requests re-sent after a 429/5xx, connection error or 401.',
+                                 {(('method', method), ('endpoint', endpoint)): count
+                                  for (method, endpoint), count in self.retries.items()})
+            self._render_histograms(lines, 'device42_import_phase_duration_seconds',
+                                    'Time per row spent in each import phase.',
+                                    {(('phase', phase),): histogram for phase, histogram in self.phases.items()})
+            self._render_counter(lines, 'device42_import_rows_total', 'Rows finished by status.',
+                                 {(('status', status),): count for status, count in self.rows.items()})
+        gauges = dict(gauges or {})
+        gauges['device42_import_rows_per_second'] = ('Rows finished per second since the first import started.',
+                                                     self.rows_per_second())
+        for name, (help_text, value) in gauges.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def _render_counter(self, lines, name, help_text, samples):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} counter")
+        for labels, value in sorted(samples.items()):
+            lines.append(f"{name}{{{_labels(labels)}}} {value}")
+
+    def _render_histograms(self, lines, name, help_text, histograms):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for labels, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f"{name}_bucket{{{_labels(labels + (('le', le),))}}} {cumulative}")
+            lines.append(f"{name}_sum{{{_labels(labels)}}} {histogram.sum}")
+            lines.append(f"{name}_count{{{_labels(labels)}}} {histogram.count}")
+
+
+def _labels(pairs):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped))
@@ -0,0 +1,164 @@
+import threading
+
+
+class RowResult:
+    """Outcome of importing a single CSV row."""
+
+    IMPORTED = 'imported'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+    # What a delta import did with an imported row
+    CREATED = 'created'
+    UPDATED = 'updated'
+    UNCHANGED = 'unchanged'
+    # Row was already committed according to the resume journal
+    RESUMED = 'resumed'
+    # Row was combined with a later row for the same object and imported as part of it
+    COALESCED = 'coalesced'
+
+    def __init__(self, row_num, object_type, name):
+        self.row_num = row_num
+        self.object_type = object_type
+        self.name = name
+        self.status = None
+        self.action = None  # created/updated/unchanged for delta imports, resumed/coalesced otherwise
+        self.status_code = None
+        self.object_id = None
+        self.error = None
+        self.custom_fields = []  # One entry per custom field
+        self.timings = {}  # Phase name -> seconds, e.g. 'create' and 'custom_fields'
+
+    def add_custom_field(self, field, status_code, error=None, key=None):
+        """Record the outcome of one custom field update; `key` is its csv_mappings field."""
+        self.custom_fields.append({"field": field, "key": key, "status_code": status_code, "error": error})
+
+    def add_timing(self, phase, seconds):
+        """Add time spent in one phase of importing this row."""
+        self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def coalesced(self, row_num):
+        """Return the result for row `row_num`, which was coalesced into this row."""
+        result = RowResult(row_num, self.object_type, self.name)
+        result.status = self.status
+        result.action = RowResult.COALESCED
+        result.status_code = self.status_code
+        result.object_id = self.object_id
+        result.error = self.error if self.error is None else f"Coalesced into row {self.row_num}: {self.error}"
+        return result
+
+    def to_dict(self):
+        """Return the result as a plain dict, e.g. for templates or JSON."""
+        return {
+            "row_num": self.row_num,
+            "object_type": self.object_type,
+            "name": self.name,
+            "status": self.status,
+            "action": self.action,
+            "status_code": self.status_code,
+            "object_id": self.object_id,
+            "error": self.error,
+            "custom_fields": list(self.custom_fields),
+            "timings": dict(self.timings),
+        }
+
+
+class ImportReport:
+    """Thread-safe collection of per-row results for one import run.
+
+    Counts and timing totals cover every row. With `keep_imported=False` only failed and
+    skipped rows are kept, so a long streaming import doesn't hold a result per row;
+    `listener` is called with each result as it completes, from the worker thread.
+    """
+
+    def __init__(self, keep_imported=True, listener=None):
+        self._lock = threading.Lock()
+        self.keep_imported = keep_imported
+        self.listener = listener
+        self.results = []
+        self._counts = {RowResult.IMPORTED: 0, RowResult.FAILED: 0, RowResult.SKIPPED: 0}
+        self._action_counts = {}
+        self._timing_totals = {}
+
+    def add(self, result):
+        """Add a RowResult; safe to call from worker threads."""
+        with self._lock:
+            self._counts[result.status] = self._counts.get(result.status, 0) + 1
+            if result.action is not None:
+                self._action_counts[result.action] = self._action_counts.get(result.action, 0) + 1
+            for phase, seconds in result.timings.items():
+                self._timing_totals[phase] = self._timing_totals.get(phase, 0.0) + seconds
+            if self.keep_imported or result.status != RowResult.IMPORTED:
+                self.results.append(result)
+        if self.listener is not None:
+            self.listener(result)
+
+    def merge(self, other):
+        """Fold another report's counts and kept results into this one, e.g. from a worker process.
+
+        The listener is not called for the merged results.
+        """
+        with self._lock:
+            for status, count in other.counts().items():
+                self._counts[status] = self._counts.get(status, 0) + count
+            for action, count in other.action_counts().items():
+                self._action_counts[action] = self._action_counts.get(action, 0) + count
+            for phase, seconds in other.timing_totals().items():
+                self._timing_totals[phase] = self._timing_totals.get(phase, 0.0) + seconds
+            self.results.extend(other.results)
+
+    def __getstate__(self):
+        # Reports cross process boundaries without their lock or listener
+        state = dict(self.__dict__)
+        del state['_lock']
+        state['listener'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def sorted_results(self):
+        """Return the kept results in CSV row order regardless of completion order."""
+        with self._lock:
+            return sorted(self.results, key=lambda result: result.row_num or 0)
+
+    def by_status(self, status):
+        """Return the kept results with the given status, in row order."""
+        return [result for result in self.sorted_results() if result.status == status]
+
+    @property
+    def imported(self):
+        return self.by_status(RowResult.IMPORTED)
+
+    @property
+    def failed(self):
+        return self.by_status(RowResult.FAILED)
+
+    @property
+    def skipped(self):
+        return self.by_status(RowResult.SKIPPED)
+
+    def counts(self):
+        """Return a dict of status -> number of rows."""
+        with self._lock:
+            return dict(self._counts)
+
+    def action_counts(self):
+        """Return a dict of action (created/updated/unchanged/resumed/coalesced) -> number of rows."""
+        with self._lock:
+            return dict(self._action_counts)
+
+    def timing_totals(self):
+        """Return a dict of phase -> total seconds across all rows."""
+        with self._lock:
+            return dict(self._timing_totals)
+
+    def summary(self):
+        """Return a one-line human readable summary of the run."""
+        counts = self.counts()
+        summary = ", ".join(f"{count} {status}" for status, count in counts.items())
+        action_counts = self.action_counts()
+        if action_counts:
+            summary += " (" + ", ".join(f"{count} {action}" for action, count in action_counts.items()) + ")"
+        return summary
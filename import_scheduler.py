@@ -0,0 +1,131 @@
+# csv_mappings fields whose value names another object, and the object type they point at
+REFERENCE_FIELDS = {
+    'customer': 'Customer',
+    'building': 'Building',
+    'appcomps': 'Application',
+}
+
+# How rows for the same object are combined by ImportScheduler.coalesce
+COALESCE_POLICIES = ('merge', 'last')
+
+
+class ImportScheduler:
+    """Group CSV rows into dependency-ordered waves that can each be imported in parallel.
+
+    A row depends on every row in the same file that creates an object it references
+    (e.g. a Device's building or primary application), and on the previous row for its
+    own object so repeated rows keep file order. References to objects that are not in
+    the file are assumed to already exist in Device42.
+    """
+
+    def __init__(self, csv_mappings, reference_fields=None):
+        self.csv_mappings = csv_mappings
+        self.reference_fields = REFERENCE_FIELDS if reference_fields is None else reference_fields
+
+    def row_key(self, row):
+        """Return the (object_type, name) identity of a CSV row."""
+        return row.get(self.csv_mappings['object_type']), row.get(self.csv_mappings['name'])
+
+    def references(self, row):
+        """Return the (object_type, name) keys of the objects a row refers to."""
+        references = []
+        for api_field, object_type in self.reference_fields.items():
+            csv_column = self.csv_mappings.get(api_field)
+            value = row.get(csv_column) if csv_column else None
+            if value:
+                references.append((object_type, value))
+        return references
+
+    def coalesce(self, numbered_rows, policy='merge'):
+        """Combine rows for the same object type and name into one row each.
+
+        With 'merge' each column takes the last non-empty value any of the rows gave it; with
+        'last' the last row replaces the earlier ones. The combined row takes the place and
+        row number of the last row for its object. Rows without a name are left alone.
+
+        Returns the combined (row_num, row) pairs, in file order, and a dict mapping each
+        combined row's number to the numbers of the rows merged into it.
+        """
+        if policy not in COALESCE_POLICIES:
+            raise ValueError(f"Unknown coalesce policy {policy!r}; expected one of {', '.join(COALESCE_POLICIES)}")
+        numbered_rows = list(numbered_rows)
+        groups = {}  # (object_type, name) -> [(row_num, row)]
+        for row_num, row in numbered_rows:
+            key = self.row_key(row)
+            if key[1]:
+                groups.setdefault(key, []).append((row_num, row))
+        if len(groups) == len(numbered_rows):
+            return numbered_rows, {}
+
+        coalesced = []
+        duplicates = {}
+        for row_num, row in numbered_rows:
+            group = groups.get(self.row_key(row))
+            if group is None or len(group) == 1:
+                coalesced.append((row_num, row))
+                continue
+            if group[-1][0] != row_num:
+                continue
+            if policy == 'merge':
+                row = dict(group[0][1])
+                for _, later_row in group[1:]:
+                    row.update((column, value) for column, value in later_row.items() if value)
+            duplicates[row_num] = [duplicate_num for duplicate_num, _ in group[:-1]]
+            coalesced.append((row_num, row))
+        return coalesced, duplicates
+
+    def waves(self, numbered_rows):
+        """Split (row_num, row) pairs into waves; every row's dependencies are in an earlier wave.
+
+        Rows stay in file order within a wave. Rows caught in a reference cycle are placed
+        after all the rows they can be ordered against.
+        """
+        numbered_rows = list(numbered_rows)
+        rows_for_key = {}  # (object_type, name) -> indexes of rows creating that object
+        dependencies = []
+        for index, (_, row) in enumerate(numbered_rows):
+            key = self.row_key(row)
+            same_key = rows_for_key.setdefault(key, [])
+            # Depend on the previous row for the same object, not on all of them
+            dependencies.append(same_key[-1:])
+            same_key.append(index)
+
+        for index, (_, row) in enumerate(numbered_rows):
+            own_key = self.row_key(row)
+            for reference in self.references(row):
+                if reference != own_key:
+                    dependencies[index].extend(rows_for_key.get(reference, []))
+
+        levels = [None] * len(numbered_rows)
+        for start in range(len(numbered_rows)):
+            if levels[start] is None:
+                self._assign_levels(start, dependencies, levels)
+
+        waves = []
+        for index, level in enumerate(levels):
+            while len(waves) <= level:
+                waves.append([])
+            waves[level].append(numbered_rows[index])
+        return waves
+
+    def _assign_levels(self, start, dependencies, levels):
+        """Iterative depth-first walk setting each row's wave to one past its deepest dependency."""
+        visiting = set()
+        stack = [(start, iter(dependencies[start]))]
+        visiting.add(start)
+        while stack:
+            index, remaining = stack[-1]
+            advanced = False
+            for dependency in remaining:
+                if levels[dependency] is None and dependency not in visiting:
+                    visiting.add(dependency)
+                    stack.append((dependency, iter(dependencies[dependency])))
+                    advanced = True
+                    break
+            if advanced:
+                continue
+            stack.pop()
+            visiting.discard(index)
+            # Dependencies still being visited are part of a cycle and are ignored here
+            resolved = [levels[dependency] for dependency in dependencies[index] if levels[dependency] is not None]
+            levels[index] = max(resolved) + 1 if resolved else 0
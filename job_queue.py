@@ -0,0 +1,325 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+from compact_rows import CompactReader, pack_rows, unpack_rows
+from device42_api import get_client
+from import_journal import ImportJournal
+from import_report import ImportReport
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobStore:
+    """SQLite-backed store of import jobs, their progress counters and per-row results."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self._connect() as conn:
+            # WAL lets the UI read progress while a worker is writing it
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    file_path TEXT,
+                    payload TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL,
+                    total_rows INTEGER,
+                    processed INTEGER NOT NULL DEFAULT 0,
+                    imported INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    skipped INTEGER NOT NULL DEFAULT 0,
+                    error TEXT,
+                    owner TEXT,
+                    heartbeat_at REAL,
+                    validation_errors TEXT
+                )""")
+            # Stores created before jobs were claimed by an owner or validated
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in (('owner', 'TEXT'), ('heartbeat_at', 'REAL'), ('validation_errors', 'TEXT')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS job_rows (
+                    job_id TEXT NOT NULL,
+                    row_num INTEGER,
+                    status TEXT,
+                    object_type TEXT,
+                    name TEXT,
+                    status_code INTEGER,
+                    error TEXT
+                )""")
+            conn.execute("CREATE INDEX IF NOT EXISTS job_rows_job ON job_rows (job_id, status, row_num)")
+
+    def _connect(self):
+        # One short-lived connection per call keeps the store safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_job(self, file_path=None, rows=None, total_rows=None):
+        """Create a queued job for a saved CSV file or an explicit list of rows and return its ID."""
+        job_id = uuid.uuid4().hex
+        payload = json.dumps(pack_rows(rows)) if rows is not None else None
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, file_path, payload, created_at, total_rows) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, file_path, payload, time.time(), total_rows))
+        return job_id
+
+    def get_job(self, job_id):
+        """Return a job as a dict (without its row payload), or None if it doesn't exist."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job.pop('payload')
+        job['validation_errors'] = json.loads(job['validation_errors']) if job['validation_errors'] else []
+        return job
+
+    def get_payload(self, job_id):
+        """Return the list of rows stored with a job, or None for file-based jobs."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return unpack_rows(json.loads(row['payload'])) if row and row['payload'] else None
+
+    def unfinished_jobs(self):
+        """Return the IDs of queued or running jobs, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+                                (QUEUED, RUNNING)).fetchall()
+        return [row['id'] for row in rows]
+
+    def abandoned_jobs(self, stale_after):
+        """Return the IDs of running jobs whose owner has sent no heartbeat for `stale_after` seconds."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?) "
+                                "ORDER BY created_at", (RUNNING, time.time() - stale_after)).fetchall()
+        return [row['id'] for row in rows]
+
+    def claim(self, job_id, owner):
+        """Atomically move a queued job to running under `owner`; return False if someone else has it."""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, started_at = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                (RUNNING, owner, now, now, job_id, QUEUED))
+        return cursor.rowcount == 1
+
+    def heartbeat(self, owner):
+        """Record that `owner` is still running its jobs."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = ?",
+                         (time.time(), owner, RUNNING))
+
+    def requeue_abandoned(self, job_id, stale_after):
+        """Re-queue a running job whose owner has sent no heartbeat for `stale_after` seconds.
+
+        Its stored results and counters are dropped in the same transaction, so a live owner's
+        job is never touched and the job can't be claimed again before it has been reset.
+        Returns True if the job was re-queued.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, owner = NULL WHERE id = ? AND status = ? "
+                "AND (heartbeat_at IS NULL OR heartbeat_at < ?)",
+                (QUEUED, job_id, RUNNING, time.time() - stale_after))
+            if cursor.rowcount != 1:
+                return False
+            self._clear_results(conn, job_id)
+        return True
+
+    def set_validation(self, job_id, validation):
+        """Record the outcome of validating a job's file: its row count and the errors found."""
+        errors = [str(issue) for issue in validation.errors]
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET total_rows = ?, validation_errors = ? WHERE id = ?",
+                         (validation.rows, json.dumps(errors) if errors else None, job_id))
+
+    def mark_finished(self, job_id, error=None):
+        """Mark a job done, or failed when an error message is given."""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET status = ?, finished_at = ?, error = ? WHERE id = ?",
+                         (FAILED if error else DONE, time.time(), error, job_id))
+
+    def add_results(self, job_id, results):
+        """Store a batch of RowResults and bump the job's progress counters."""
+        counts = {'imported': 0, 'failed': 0, 'skipped': 0}
+        for result in results:
+            counts[result.status] = counts.get(result.status, 0) + 1
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO job_rows (job_id, row_num, status, object_type, name, status_code, error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(job_id, result.row_num, result.status, result.object_type, result.name,
+                  result.status_code, result.error) for result in results])
+            conn.execute(
+                "UPDATE jobs SET processed = processed + ?, imported = imported + ?, failed = failed + ?, "
+                "skipped = skipped + ? WHERE id = ?",
+                (len(results), counts['imported'], counts['failed'], counts['skipped'], job_id))
+
+    def clear_results(self, job_id):
+        """Drop stored results and counters, e.g. before re-running an interrupted job."""
+        with self._connect() as conn:
+            self._clear_results(conn, job_id)
+
+    def _clear_results(self, conn, job_id):
+        conn.execute("DELETE FROM job_rows WHERE job_id = ?", (job_id,))
+        conn.execute("UPDATE jobs SET processed = 0, imported = 0, failed = 0, skipped = 0 WHERE id = ?",
+                     (job_id,))
+
+    def list_results(self, job_id, statuses, limit=1000):
+        """Return up to `limit` stored row results with one of the given statuses, in row order."""
+        placeholders = ", ".join("?" for _ in statuses)
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT * FROM job_rows WHERE job_id = ? AND status IN ({placeholders}) ORDER BY row_num LIMIT ?",
+                (job_id, *statuses, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+
+class JobProgress:
+    """ImportReport listener that writes results to the store in batches rather than per row."""
+
+    def __init__(self, store, job_id, batch_size=200, interval=1.0):
+        self.store = store
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.interval = interval
+        self._pending = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __call__(self, result):
+        with self._lock:
+            self._pending.append(result)
+            if len(self._pending) >= self.batch_size or time.monotonic() - self._last_flush >= self.interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._pending:
+            self.store.add_results(self.job_id, self._pending)
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+
+class JobQueue:
+    """Runs import jobs from a JobStore on a local thread pool, separate from the Flask workers.
+
+    Several processes (server workers, or both web apps) may share one store. A job is run by
+    whichever process claims it first, and each process keeps a heartbeat on the jobs it owns so
+    the others can tell a running job from one abandoned by a process that has gone away.
+    """
+
+    def __init__(self, store, config_file, workers=None):
+        self.store = store
+        self.config_file = config_file
+        with open(config_file, 'r') as file:
+            jobs_config = (yaml.safe_load(file) or {}).get('jobs', {}) or {}
+        if workers is None:
+            workers = jobs_config.get('workers', 2)
+        self.heartbeat_interval = jobs_config.get('heartbeat_interval', 10)
+        self.stale_after = jobs_config.get('stale_after', 60)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self._heartbeat = threading.Thread(target=self._beat, name='job-heartbeat', daemon=True)
+        self._heartbeat.start()
+
+    def _beat(self):
+        """Keep this process's jobs alive and take over jobs abandoned by processes that have gone away."""
+        while True:
+            time.sleep(self.heartbeat_interval)
+            try:
+                self.store.heartbeat(self.owner)
+                for job_id in self.store.abandoned_jobs(self.stale_after):
+                    if self.store.requeue_abandoned(job_id, self.stale_after):
+                        self.executor.submit(self._run, job_id)
+            except sqlite3.Error:
+                # A busy store only delays the next beat; stale_after leaves room for a few misses
+                pass
+
+    def submit_file(self, file_path):
+        """Queue an import of a saved CSV file and return the job ID immediately.
+
+        The file isn't read here. The job validates it first, which also counts its rows, and
+        only imports it if no errors were found.
+        """
+        job_id = self.store.create_job(file_path=file_path)
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def submit_rows(self, rows):
+        """Queue an import of a list of row dicts and return the job ID immediately."""
+        job_id = self.store.create_job(rows=rows, total_rows=len(rows))
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def journal_path(self, job_id):
+        """Return the path of a job's checkpoint journal, kept next to the job store."""
+        return os.path.join(os.path.dirname(os.path.abspath(self.store.db_path)), f"job_{job_id}.journal.sqlite3")
+
+    def resume_unfinished(self):
+        """Pick up queued jobs and jobs whose owning process has gone; their journals skip rows already sent.
+
+        Jobs another live process is running are left alone.
+        """
+        for job_id in self.store.unfinished_jobs():
+            job = self.store.get_job(job_id)
+            if job['status'] == RUNNING and not self.store.requeue_abandoned(job_id, self.stale_after):
+                continue
+            self.executor.submit(self._run, job_id)
+
+    def _run(self, job_id):
+        """Run one job, recording progress and the final status in the store."""
+        # Another process sharing the store may have claimed the job first
+        if not self.store.claim(job_id, self.owner):
+            return
+        job = self.store.get_job(job_id)
+        progress = JobProgress(self.store, job_id)
+        journal = ImportJournal(self.journal_path(job_id))
+        try:
+            # The process-wide client is shared with the other jobs and the web requests
+            device42_api = get_client(self.config_file)
+            report = ImportReport(keep_imported=False, listener=progress)
+            if job['file_path']:
+                # A job re-run after a restart was validated before it started importing
+                if job['total_rows'] is None:
+                    with open(job['file_path'], 'r') as csv_file:
+                        validation = device42_api.validate_csv(csv_file)
+                    self.store.set_validation(job_id, validation)
+                    if not validation.ok:
+                        os.remove(job['file_path'])
+                        raise ValueError("The file has errors, so none of its rows were imported.")
+                with open(job['file_path'], 'r') as csv_file:
+                    device42_api.import_from_csv(CompactReader(csv_file), report=report, journal=journal)
+            else:
+                device42_api.import_from_csv(self.store.get_payload(job_id), report=report, journal=journal)
+            progress.flush()
+            self.store.mark_finished(job_id)
+        except Exception as e:
+            progress.flush()
+            self.store.mark_finished(job_id, error=str(e))
+        finally:
+            journal.close()
+        # The journal is only needed to resume an interrupted run
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.journal_path(job_id) + suffix):
+                os.remove(self.journal_path(job_id) + suffix)
@@ -0,0 +1,146 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+# Process-wide caches, one per Device42 host, shared by every Device42API instance
+_shared_caches = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cache(host, ttl, max_entries):
+    """Return the process-wide LookupCache for a host, creating it on first use.
+
+    A client built from an edited config may ask for a different TTL or size; the existing
+    cache is resized to match rather than kept with the settings it was created with.
+    """
+    with _shared_lock:
+        cache = _shared_caches.get(host)
+        if cache is None:
+            cache = LookupCache(ttl, max_entries)
+            _shared_caches[host] = cache
+        elif (cache.ttl, cache.max_entries) != (ttl, max_entries):
+            cache.resize(ttl, max_entries)
+        return cache
+
+
+class LookupCache:
+    """Thread-safe TTL cache with LRU eviction for Device42 lookups.
+
+    Keys are tuples of (kind, object_type, value), e.g. ('id_by_name', 'Device', 'Server1')
+    or ('by_id', 'Device', 42), so all entries for one object can be invalidated together.
+    Whole name indexes of a type are cached as ('index', object_type, None).
+    """
+
+    def __init__(self, ttl=300, max_entries=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return (True, value) for a fresh entry, otherwise (False, None)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > self._clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        """Store a value, evicting the least recently used entries beyond max_entries."""
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def resize(self, ttl, max_entries):
+        """Change the TTL and size limit; entries are evicted or expire sooner to fit the new limits."""
+        with self._lock:
+            self.ttl = ttl
+            self.max_entries = max_entries
+            latest = self._clock() + ttl
+            for key, (expires_at, value) in self._entries.items():
+                if expires_at > latest:
+                    self._entries[key] = (latest, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        """Drop a single entry if present."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_object(self, object_type, name=None, object_id=None):
+        """Drop the name and ID lookups cached for one object, and any cached index of its type."""
+        with self._lock:
+            self._entries.pop(('index', object_type, None), None)
+            if name is not None:
+                self._entries.pop(('id_by_name', object_type, name), None)
+            if object_id is not None:
+                self._entries.pop(('by_id', object_type, object_id), None)
+                # IDs may be cached as ints or as the strings they came in as
+                self._entries.pop(('by_id', object_type, str(object_id)), None)
+
+    def clear(self):
+        """Drop every entry; counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss/eviction counters and the current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one; later callers wait for its result.
+
+    Only calls that overlap are shared. Once the first call returns, the next call for the key
+    runs again; keeping results is the LookupCache's job.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> Future of the call in flight
+        self.shared = 0  # Calls answered by another caller's request
+
+    def do(self, key, function):
+        """Return function(), or the result of the call for `key` already in flight."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+            else:
+                self.shared += 1
+        if not leader:
+            return call.result()
+        try:
+            result = function()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
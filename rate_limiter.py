@@ -0,0 +1,107 @@
+import multiprocessing
+import threading
+import time
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts of up to `burst`."""
+
+    def __init__(self, rate, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = self.burst
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available."""
+        while True:
+            wait = self.try_acquire()
+            if not wait:
+                return
+            self._sleep(wait)
+
+    def try_acquire(self):
+        """Take one token if one is available and return 0, otherwise return the seconds until one will be.
+
+        Callers that must not block, such as coroutines, sleep for the returned time themselves and retry.
+        """
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+
+class SharedTokenBucket(TokenBucket):
+    """TokenBucket whose tokens live in shared memory, so one rate holds across worker processes.
+
+    Create it in the parent and pass it to the processes as they are started. It relies on
+    time.monotonic being the same clock in every process, as it is on Linux and macOS.
+    """
+
+    def __init__(self, rate, burst=None, context=multiprocessing):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._clock = time.monotonic
+        self._sleep = time.sleep
+        self._state = context.Array('d', [self.burst, self._clock()])  # tokens, last update
+
+    def try_acquire(self):
+        with self._state.get_lock():
+            now = self._clock()
+            tokens = min(self.burst, self._state[0] + (now - self._state[1]) * self.rate)
+            self._state[1] = now
+            if tokens >= 1:
+                self._state[0] = tokens - 1
+                return 0
+            self._state[0] = tokens
+            return (1 - tokens) / self.rate
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on concurrent requests that follows the appliance's health.
+
+    Each healthy response raises the limit by 1/limit, i.e. about one extra slot per round
+    of requests. An error, a retried 429/5xx, or a response slower than `latency_target`
+    halves it, at most once per `cooldown` seconds so one burst of failures counts once.
+    """
+
+    def __init__(self, minimum=1, maximum=16, initial=None, latency_target=2.0, cooldown=1.0,
+                 clock=time.monotonic):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(initial if initial is not None else maximum)
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self._clock = clock
+        self._last_decrease = float('-inf')
+        self.in_flight = 0
+        self.decreases = 0
+        self._cond = threading.Condition()
+
+    def acquire(self):
+        """Wait for a free slot under the current limit."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency, congested):
+        """Free a slot and adjust the limit from the request's latency and outcome."""
+        with self._cond:
+            self.in_flight -= 1
+            if congested or latency > self.latency_target:
+                now = self._clock()
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self._last_decrease = now
+                    self.decreases += 1
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
@@ -0,0 +1,110 @@
+from operator import itemgetter
+
+from compact_rows import CompactRow
+
+# Path segments of the object and custom field endpoints, and the ID field the custom field endpoint expects
+OBJECT_ENDPOINTS = {
+    "Device": ("devices", "device", "device_id"),
+    "Building": ("buildings", "building", "id"),
+    "Application": ("appcomps", "appcomp", "id"),
+    "Customer": ("customers", "customer", "id"),
+}
+
+
+class TypePlan:
+    """Endpoints, custom fields and payload layout for one object type, worked out once from config.yaml."""
+
+    def __init__(self, object_type, endpoint, custom_field_endpoint, id_field, custom_fields):
+        self.object_type = object_type
+        self.endpoint = endpoint
+        self.custom_field_endpoint = custom_field_endpoint
+        self.id_field = id_field
+        self.custom_fields = custom_fields  # API field -> custom field label
+
+    def custom_field_payload(self, object_id, key, value):
+        """Return the form data setting one custom field on an object."""
+        return {self.id_field: object_id, "key": key, "value": value}
+
+    def custom_field_values(self, device):
+        """Return the non-empty custom field values of a mapped row."""
+        return {field: device[field] for field in self.custom_fields if device.get(field)}
+
+
+class RowMapper:
+    """Turns rows that have the same mapped columns into API payloads without re-checking each mapping."""
+
+    def __init__(self, pairs, absent):
+        self.pairs = tuple(pairs)  # (API field, CSV column) for the mapped columns these rows have
+        self.absent = frozenset(absent)  # Mapped columns these rows don't have
+
+    def apply(self, row):
+        """Map a row, raising KeyError if it lacks one of this mapper's columns."""
+        return {api_field: row[csv_column] for api_field, csv_column in self.pairs}
+
+
+class IndexedRowMapper:
+    """Maps CompactRows by position: one itemgetter call per row instead of a lookup per column."""
+
+    def __init__(self, columns, pairs, index):
+        self.columns = columns  # The header these positions belong to
+        present = [(api_field, index[csv_column]) for api_field, csv_column in pairs if csv_column in index]
+        self.fields = tuple(api_field for api_field, _ in present)
+        positions = [position for _, position in present]
+        if len(positions) > 1:
+            self._values = itemgetter(*positions)
+        else:
+            # itemgetter with a single position returns the bare value rather than a tuple
+            self._values = lambda values: tuple(values[position] for position in positions)
+
+    def apply(self, row):
+        return dict(zip(self.fields, self._values(row.values)))
+
+
+class MappingPlan:
+    """`csv_mappings` and `custom_fields` compiled into per-object-type plans and a row mapper.
+
+    Rows from one file all have the same columns, so which mappings apply is worked out from
+    the first row and reused until a row turns up with a different set of mapped columns.
+    """
+
+    def __init__(self, csv_mappings, custom_fields, base_url):
+        self.type_column = csv_mappings['object_type']
+        self.name_column = csv_mappings['name']
+        # object_type only routes the row to an endpoint and is never sent
+        self._pairs = [(api_field, csv_column) for api_field, csv_column in csv_mappings.items()
+                       if api_field != 'object_type']
+        self.api_fields = frozenset(csv_mappings)
+        self.types = {
+            object_type: TypePlan(object_type, f"{base_url}/{path}/", f"{base_url}/custom_fields/{custom_path}/",
+                                  id_field, custom_fields.get(object_type.lower(), {}) or {})
+            for object_type, (path, custom_path, id_field) in OBJECT_ENDPOINTS.items()
+        }
+        self._mapper = None
+        self._indexed_mapper = None
+
+    def for_type(self, object_type):
+        """Return the TypePlan for an object type, or None if it can't be imported."""
+        return self.types.get(object_type)
+
+    def compile(self, row):
+        """Return a RowMapper for rows with the same mapped columns as `row`."""
+        present = [(api_field, csv_column) for api_field, csv_column in self._pairs if csv_column in row]
+        absent = [csv_column for _, csv_column in self._pairs if csv_column not in row]
+        return RowMapper(present, absent)
+
+    def map_row(self, row):
+        """Map a CSV row dict or CompactRow to an API payload keyed by API field."""
+        if row.__class__ is CompactRow:
+            mapper = self._indexed_mapper
+            if mapper is None or mapper.columns != row.header.columns:
+                mapper = self._indexed_mapper = IndexedRowMapper(row.header.columns, self._pairs, row.header.index)
+            return mapper.apply(row)
+        mapper = self._mapper
+        if mapper is not None and (not mapper.absent or mapper.absent.isdisjoint(row)):
+            try:
+                return mapper.apply(row)
+            except KeyError:
+                pass
+        # First row, or a row from a file with other columns; a plain assignment is safe across threads
+        mapper = self._mapper = self.compile(row)
+        return mapper.apply(row)
@@ -0,0 +1,241 @@
+import csv
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import zlib
+
+from compact_rows import CompactReader, CompactRow, RowHeader, ValuePool
+from device42_api import Device42API
+from import_journal import ImportJournal
+from import_metrics import ImportMetrics
+from import_report import ImportReport
+from rate_limiter import SharedTokenBucket
+
+
+def shard_for(object_type, name, shards):
+    """Return the shard an object's rows go to; stable across processes and runs, unlike hash()."""
+    return zlib.crc32(f"{object_type}\x00{name}".encode('utf-8')) % shards
+
+
+def type_phases(type_references):
+    """Order object types into phases so each type is imported after the types its rows reference.
+
+    `type_references` maps each object type in the file to the types its rows reference.
+    References to a type's own objects are left to the per-shard dependency order (split_csv
+    puts the rows they link in one shard), and types caught in a reference cycle share the
+    last phase.
+    """
+    remaining = {object_type: {referenced for referenced in references
+                               if referenced != object_type and referenced in type_references}
+                 for object_type, references in type_references.items()}
+    phases = []
+    done = set()
+    while remaining:
+        ready = [object_type for object_type, references in remaining.items() if references <= done]
+        if not ready:
+            phases.append(list(remaining))
+            break
+        phases.append(ready)
+        done.update(ready)
+        for object_type in ready:
+            del remaining[object_type]
+    return phases
+
+
+def linked_groups(links, keys):
+    """Return object key -> group key, joining objects linked by references between rows in the file.
+
+    `links` are (key, referenced key) pairs; links to objects without a row (not in `keys`) are
+    ignored. Objects that aren't linked to anything are left out.
+    """
+    parent = {}
+
+    def find(key):
+        root = key
+        while parent.get(root, root) != root:
+            root = parent[root]
+        while key != root:
+            parent[key], key = root, parent[key]
+        return root
+
+    for key, reference in links:
+        if reference in keys:
+            key_root, reference_root = find(key), find(reference)
+            if key_root != reference_root:
+                parent[key_root] = reference_root
+    return {key: find(key) for key in list(parent)}
+
+
+def split_csv(csv_path, directory, shards, scheduler, null_values=('', 'NA')):
+    """Write each row of a CSV file to its shard's file, prefixed with its row number.
+
+    Rows go to the shard of their object (see shard_for), except that objects linked by
+    references to objects of their own type, e.g. Customers and their parent Customer, all go
+    to one shard, where the dependency order imports the parent first. Only references to
+    objects that have a row in the file count, as in ImportScheduler.waves, and placeholder
+    values such as NA (`null_values`) never do; the same references order the type phases.
+    Returns (shard file paths, rows per shard, type phases).
+    """
+    paths = [os.path.join(directory, f"shard_{shard}.csv") for shard in range(shards)]
+    counts = [0] * shards
+    referenced_types = set(scheduler.reference_fields.values())
+    keys = set()  # (object_type, name) of the rows other rows could reference
+    referenced_by = {}  # referenced (object_type, name) -> object types of the rows referencing it
+    links = []  # (key, referenced key) for rows referencing an object of their own type
+    type_references = {}
+    # Rows other rows may reference wait here until the whole file has been read and their links are known
+    held_path = os.path.join(directory, "held.csv")
+    files = [open(path, 'w', newline='') for path in paths]
+    try:
+        writers = [csv.writer(shard_file) for shard_file in files]
+        with open(csv_path, 'r', newline='') as csv_file, open(held_path, 'w', newline='') as held_file:
+            held = csv.writer(held_file)
+            reader = CompactReader(csv_file)
+            for writer in writers:
+                writer.writerow(reader.fieldnames)
+            # Numbered like import_from_csv numbers an unsharded file
+            for row_num, row in enumerate(reader, start=1):
+                key = object_type, name = scheduler.row_key(row)
+                type_references.setdefault(object_type, set())
+                for reference in scheduler.references(row):
+                    if reference[1] not in null_values:
+                        referenced_by.setdefault(reference, set()).add(object_type)
+                        if reference[0] == object_type and reference != key:
+                            links.append((key, reference))
+                if object_type in referenced_types:
+                    keys.add(key)
+                    held.writerow([row_num, *row.values])
+                else:
+                    shard = shard_for(object_type, name, shards)
+                    writers[shard].writerow([row_num, *row.values])
+                    counts[shard] += 1
+
+        groups = linked_groups(links, keys)
+        with open(held_path, 'r', newline='') as held_file:
+            for values in csv.reader(held_file):
+                key = scheduler.row_key(CompactRow(reader.header, values[1:]))
+                shard = shard_for(*groups.get(key, key), shards)
+                writers[shard].writerow(values)
+                counts[shard] += 1
+    finally:
+        for shard_file in files:
+            shard_file.close()
+    for reference, object_types in referenced_by.items():
+        if reference in keys:
+            for object_type in object_types:
+                type_references[object_type].add(reference[0])
+    return paths, counts, type_phases(type_references)
+
+
+def shard_rows(csv_file, object_types, type_column):
+    """Yield the (row_num, CompactRow) pairs of a shard file whose object type is in `object_types`."""
+    reader = csv.reader(csv_file)
+    header = RowHeader(next(reader, []))
+    pool = ValuePool(len(header.columns))
+    for values in reader:
+        row = CompactRow(header, pool.intern(values[1:]))
+        if row.get(type_column) in object_types:
+            yield int(values[0]), row
+
+
+def _run_shard(shard, config_file, shard_path, phases, options, barrier, rate_limiter, results):
+    """Worker process: import one shard phase by phase, then send back its report and metrics."""
+    device42_api = None
+    report = ImportReport(keep_imported=False, listener=options['listener'])
+    journal = ImportJournal(options['journal']) if options['journal'] else None
+    error = None
+    try:
+        # Each process has its own session, token and lookup cache
+        device42_api = Device42API(config_file)
+        if rate_limiter is not None:
+            device42_api.rate_limiter = rate_limiter
+        if options['delta']:
+            device42_api.prefetch(delta=True)
+        for object_types in phases:
+            with open(shard_path, 'r', newline='') as csv_file:
+                device42_api.import_from_csv(
+                    shard_rows(csv_file, set(object_types), device42_api.csv_mappings['object_type']),
+                    workers=options['workers'], report=report, dependency_order=options['dependency_order'],
+                    chunk_size=options['chunk_size'], delta=options['delta'], journal=journal,
+                    coalesce=options['coalesce'], numbered=True)
+            # No shard starts the next phase until every shard has finished this one
+            barrier.wait()
+    except Exception as e:
+        # Release the other shards from the barrier; they stop at the end of this phase
+        barrier.abort()
+        error = f"{type(e).__name__}: {e}" if str(e) else type(e).__name__
+    finally:
+        if journal is not None:
+            journal.close()
+        if device42_api is not None:
+            device42_api.close()
+    results.put((shard, report, device42_api.metrics if device42_api is not None else None, error))
+
+
+def import_sharded(config_file, csv_path, shards, listener=None, workers=None, dependency_order=None,
+                   chunk_size=None, delta=False, journal_path=None, coalesce=None, temp_dir=None):
+    """Import a CSV file with `shards` worker processes and return (ImportReport, ImportMetrics, errors).
+
+    Rows are split by a hash of their object type and name, so every row for one object lands in
+    the same shard and keeps its file order there. Object types are imported in phases (e.g.
+    Customers, then Buildings and Applications, then Devices) with all shards finishing a phase
+    before any starts the next, so references across shards resolve. Each worker has its own
+    Device42API session and token; `rate_limit.requests_per_second` is shared by all of them.
+    `listener` is called in the worker processes as rows finish, so it must be picklable.
+    `errors` lists the shards that stopped early and why.
+    """
+    device42_api = Device42API(config_file)
+    if dependency_order is None:
+        dependency_order = device42_api.dependency_order
+    context = multiprocessing.get_context('spawn')
+    rate_limiter = None
+    if device42_api.rate_limiter is not None:
+        rate_limiter = SharedTokenBucket(device42_api.rate_limiter.rate, device42_api.rate_limiter.burst, context)
+
+    directory = tempfile.mkdtemp(prefix='device42_shards_', dir=temp_dir)
+    try:
+        paths, counts, phases = split_csv(csv_path, directory, shards, device42_api.scheduler,
+                                          device42_api.validator.null_values)
+        if not dependency_order:
+            phases = [[object_type for phase in phases for object_type in phase]]
+        options = {"listener": listener, "workers": workers, "dependency_order": dependency_order,
+                   "chunk_size": chunk_size, "delta": delta, "journal": journal_path, "coalesce": coalesce}
+        barrier = context.Barrier(shards)
+        results = context.Queue()
+        processes = [context.Process(target=_run_shard, name=f"device42-shard-{shard}",
+                                     args=(shard, config_file, paths[shard], phases, options, barrier,
+                                           rate_limiter, results))
+                     for shard in range(shards)]
+        for process in processes:
+            process.start()
+
+        report = ImportReport(keep_imported=False)
+        metrics = ImportMetrics(device42_api.metrics.buckets)
+        errors = []
+        pending = set(range(shards))
+        while pending:
+            try:
+                shard, shard_report, shard_metrics, error = results.get(timeout=1.0)
+            except queue.Empty:
+                # A worker that died without reporting (e.g. killed) would otherwise be waited on forever
+                for shard in sorted(pending):
+                    if processes[shard].exitcode not in (None, 0):
+                        pending.discard(shard)
+                        barrier.abort()
+                        errors.append(f"Shard {shard} ({counts[shard]} rows) exited with status "
+                                      f"{processes[shard].exitcode}")
+                continue
+            pending.discard(shard)
+            report.merge(shard_report)
+            if shard_metrics is not None:
+                metrics.merge(shard_metrics)
+            if error:
+                errors.append(f"Shard {shard} ({counts[shard]} rows): {error}")
+        for process in processes:
+            process.join()
+        return report, metrics, errors
+    finally:
+        device42_api.close()
+        shutil.rmtree(directory, ignore_errors=True)
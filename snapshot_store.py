@@ -0,0 +1,140 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+
+class SnapshotStore:
+    """On-disk SQLite copy of the Device42 inventory, indexed by object type and name.
+
+    Lookups read from the snapshot instead of the appliance, so previews of large files
+    don't send any read traffic to the production CMDB. `refresh` fills or updates it.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    object_type TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    object_id TEXT,
+                    record TEXT NOT NULL,
+                    PRIMARY KEY (object_type, name)
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS syncs (
+                    object_type TEXT PRIMARY KEY,
+                    synced_at TEXT NOT NULL,
+                    full_sync_at TEXT NOT NULL
+                )""")
+
+    def _connect(self):
+        # Lookups happen once per row, so each thread keeps its own connection open
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            self._local.conn = conn
+        return conn
+
+    def get(self, object_type, name):
+        """Return the stored record for an object, or None if the snapshot doesn't have it."""
+        row = self._connect().execute(
+            "SELECT record FROM objects WHERE object_type = ? AND name = ?", (object_type, name)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def has(self, object_type):
+        """Return True once the object type has been synced at least once."""
+        return self.last_sync(object_type) is not None
+
+    def last_sync(self, object_type):
+        """Return (synced_at, full_sync_at) for an object type, or None if it was never synced."""
+        row = self._connect().execute(
+            "SELECT synced_at, full_sync_at FROM syncs WHERE object_type = ?", (object_type,)).fetchone()
+        return tuple(row) if row else None
+
+    def age(self, object_type):
+        """Return the seconds since an object type was last synced, or None if it was never synced."""
+        sync = self.last_sync(object_type)
+        if sync is None:
+            return None
+        return (datetime.now(timezone.utc) - datetime.fromisoformat(sync[0])).total_seconds()
+
+    def count(self, object_type):
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM objects WHERE object_type = ?", (object_type,)).fetchone()[0]
+
+    def refresh(self, device42_api, object_types, full=False, incremental_types=(),
+                incremental_param='last_updated_gt', skew_seconds=300):
+        """Sync object types from the appliance and return a dict of object_type -> records written.
+
+        Types in `incremental_types` that were synced before only fetch records changed since the
+        last sync (minus `skew_seconds` for clock drift); everything else is re-listed in full,
+        which also drops objects deleted from Device42.
+        """
+        written = {}
+        for object_type in object_types:
+            # Taken before listing so changes made during the sync are picked up next time
+            started_at = datetime.now(timezone.utc)
+            previous = self.last_sync(object_type)
+            incremental = not full and previous is not None and object_type in incremental_types
+            params = {}
+            if incremental:
+                since = datetime.fromisoformat(previous[0]) - timedelta(seconds=skew_seconds)
+                params[incremental_param] = since.strftime('%Y-%m-%d %H:%M:%S')
+
+            conn = self._connect()
+            with conn:
+                if not incremental:
+                    conn.execute("DELETE FROM objects WHERE object_type = ?", (object_type,))
+                count = 0
+                batch = []
+                for record in device42_api.list_objects(object_type, params=params):
+                    batch.append((object_type, record.get('name'), str(device42_api.record_id(object_type, record)),
+                                  json.dumps(record)))
+                    if len(batch) >= 1000:
+                        count += self._write(conn, batch)
+                        batch = []
+                count += self._write(conn, batch)
+                full_sync_at = previous[1] if incremental else started_at.isoformat()
+                conn.execute("INSERT OR REPLACE INTO syncs (object_type, synced_at, full_sync_at) VALUES (?, ?, ?)",
+                             (object_type, started_at.isoformat(), full_sync_at))
+            written[object_type] = count
+        return written
+
+    def _write(self, conn, batch):
+        conn.executemany(
+            "INSERT OR REPLACE INTO objects (object_type, name, object_id, record) VALUES (?, ?, ?, ?)", batch)
+        return len(batch)
+
+
+def main():
+    """Build or refresh the inventory snapshot configured under `snapshot` in config.yaml."""
+    # Imported here because device42_api itself imports this module
+    from device42_api import LIST_RESPONSE_KEYS, Device42API
+
+    parser = argparse.ArgumentParser(description="Export the Device42 inventory into the local snapshot store.")
+    parser.add_argument('-c', '--config', type=str, required=True, help='Path to config.yaml')
+    parser.add_argument('--full', action='store_true', help='Re-list every object type instead of fetching changes')
+    parser.add_argument('-t', '--type', action='append', dest='types', choices=sorted(LIST_RESPONSE_KEYS),
+                        help='Object type to sync; repeat for several (default: all)')
+    args = parser.parse_args()
+
+    device42_api = Device42API(args.config)
+    if device42_api.snapshot is None:
+        print("Error: set snapshot.path in the config file to use a snapshot.")
+        return
+
+    started = time.perf_counter()
+    written = device42_api.refresh_snapshot(args.types, full=args.full)
+    for object_type, count in written.items():
+        print(f"{object_type}: {count} records written, {device42_api.snapshot.count(object_type)} in snapshot")
+    print(f"Snapshot {device42_api.snapshot.db_path} refreshed in {time.perf_counter() - started:.1f}s.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+import csv
+import json
+import sqlite3
+import time
+import uuid
+
+from compact_rows import CompactRow, RowHeader, ValuePool
+
+
+class UploadStore:
+    """SQLite-backed store of parsed uploads awaiting confirmation on the compare page.
+
+    Each upload keeps its CSV header once and every row as a JSON array of values, keyed by
+    its 1-based row number, so the compare page can show one page at a time and the confirm
+    form only has to send row numbers. Rows selected on any page are remembered here.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    id TEXT PRIMARY KEY,
+                    filename TEXT,
+                    columns TEXT NOT NULL,
+                    total_rows INTEGER NOT NULL,
+                    created_at REAL NOT NULL
+                )""")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS upload_rows (
+                    upload_id TEXT NOT NULL,
+                    row_num INTEGER NOT NULL,
+                    data TEXT NOT NULL,
+                    selected INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (upload_id, row_num)
+                )""")
+
+    def _connect(self):
+        # One short-lived connection per call keeps the store safe to use from any thread
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_upload(self, csv_file, filename=None, batch_size=5000):
+        """Parse an open CSV file into the store and return the new upload's ID."""
+        upload_id = uuid.uuid4().hex
+        reader = csv.reader(csv_file)
+        columns = next(reader, [])
+        total_rows = 0
+        with self._connect() as conn:
+            batch = []
+            # Blank lines are skipped, as csv.DictReader does
+            for total_rows, values in enumerate(filter(None, reader), start=1):
+                batch.append((upload_id, total_rows, json.dumps(values)))
+                if len(batch) >= batch_size:
+                    conn.executemany("INSERT INTO upload_rows (upload_id, row_num, data) VALUES (?, ?, ?)", batch)
+                    batch = []
+            conn.executemany("INSERT INTO upload_rows (upload_id, row_num, data) VALUES (?, ?, ?)", batch)
+            conn.execute("INSERT INTO uploads (id, filename, columns, total_rows, created_at) VALUES (?, ?, ?, ?, ?)",
+                         (upload_id, filename, json.dumps(columns), total_rows, time.time()))
+        return upload_id
+
+    def get_upload(self, upload_id):
+        """Return an upload as a dict with its columns and selected row count, or None if it doesn't exist."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM uploads WHERE id = ?", (upload_id,)).fetchone()
+            if row is None:
+                return None
+            selected = conn.execute("SELECT COUNT(*) FROM upload_rows WHERE upload_id = ? AND selected = 1",
+                                    (upload_id,)).fetchone()[0]
+        upload = dict(row)
+        upload['columns'] = json.loads(upload['columns'])
+        upload['selected'] = selected
+        return upload
+
+    def page(self, upload, page, page_size):
+        """Return [(row_num, CompactRow, selected)] for a 1-based page of an upload."""
+        first = (page - 1) * page_size + 1
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT row_num, data, selected FROM upload_rows WHERE upload_id = ? AND row_num BETWEEN ? AND ? "
+                "ORDER BY row_num", (upload['id'], first, first + page_size - 1)).fetchall()
+        header = RowHeader(upload['columns'])
+        return [(row['row_num'], CompactRow(header, json.loads(row['data'])), bool(row['selected'])) for row in rows]
+
+    def set_selected(self, upload_id, first_row, last_row, row_nums):
+        """Make `row_nums` the selected rows between first_row and last_row, inclusive."""
+        with self._connect() as conn:
+            conn.execute("UPDATE upload_rows SET selected = 0 WHERE upload_id = ? AND row_num BETWEEN ? AND ?",
+                         (upload_id, first_row, last_row))
+            conn.executemany("UPDATE upload_rows SET selected = 1 WHERE upload_id = ? AND row_num = ?",
+                             [(upload_id, row_num) for row_num in row_nums if first_row <= row_num <= last_row])
+
+    def rows(self, upload, selected_only=False):
+        """Return an upload's rows as CompactRows in file order, optionally only the selected ones."""
+        query = "SELECT data FROM upload_rows WHERE upload_id = ?"
+        if selected_only:
+            query += " AND selected = 1"
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY row_num", (upload['id'],)).fetchall()
+        header = RowHeader(upload['columns'])
+        pool = ValuePool(len(header.columns))
+        return [CompactRow(header, pool.intern(json.loads(row['data']))) for row in rows]
+
+    def delete_upload(self, upload_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM upload_rows WHERE upload_id = ?", (upload_id,))
+            conn.execute("DELETE FROM uploads WHERE id = ?", (upload_id,))
+
+    def purge(self, max_age):
+        """Delete uploads created more than `max_age` seconds ago; return how many were deleted."""
+        with self._connect() as conn:
+            expired = [row['id'] for row in conn.execute("SELECT id FROM uploads WHERE created_at < ?",
+                                                         (time.time() - max_age,)).fetchall()]
+        for upload_id in expired:
+            self.delete_upload(upload_id)
+        return len(expired)
@@ -1,20 +1,30 @@
-import json
-from flask import Flask, request, render_template, redirect, url_for, flash, session
+from flask import Flask, request, render_template, redirect, url_for, flash, session, jsonify, Response
 from werkzeug.utils import secure_filename
 import os
-import csv
-import urllib.parse
-from device42_api import Device42API
+import uuid
+from device42_api import get_client
+from job_queue import JobQueue, JobStore, QUEUED, RUNNING
+from upload_store import UploadStore
 
 # Initialize the Flask app
 app = Flask(__name__)
 app.secret_key = 'your_secret_key'
 
 # Set the folder to store uploaded CSV files
-UPLOAD_FOLDER = '/app/uploads'
+UPLOAD_FOLDER = os.environ.get('DEVICE42_UPLOAD_FOLDER', '/app/uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+CONFIG_FILE = os.environ.get('DEVICE42_CONFIG', '/app/config.yaml')
+
+# Confirmed imports run as background jobs so large selections don't hold a request open
+job_store = JobStore(os.path.join(UPLOAD_FOLDER, 'jobs.sqlite3'))
+job_queue = JobQueue(job_store, CONFIG_FILE)
+job_queue.resume_unfinished()
+
+# Parsed uploads awaiting confirmation; the compare page and confirm form only pass row numbers
+upload_store = UploadStore(os.path.join(UPLOAD_FOLDER, 'uploads.sqlite3'))
+
 ALLOWED_EXTENSIONS = {'csv'}
 
 
@@ -40,67 +50,148 @@ def upload_file():
         return redirect(request.url)
 
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
+        # Prefix with a unique ID so concurrent uploads of the same file name don't collide
+        filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(file_path)
 
-        device42_api = Device42API('/app/config.yaml')
-        comparison_data = []
-
-        # Process CSV and query Device42 for each row
-        with open(file_path, 'r') as csv_file:
-            csv_reader = csv.DictReader(csv_file)
-            for row in csv_reader:
-                name = row.get('Name')
-                obj_type = row.get('ObjectType')
-                existing_data = device42_api.check_existing(name, obj_type)
-                # Map existing_data to CSV field names based on csv_mappings
-                mapped_existing_data = {}
-                if existing_data:
-                    print(existing_data)
-                    for api_field, csv_field in device42_api.csv_mappings.items():
-                        mapped_existing_data[csv_field] = existing_data['data'].get(api_field, 'N/A')
-
-                new = json.dumps(row)
-                new2 = urllib.parse.quote(new)
-                comparison_data.append({
-                    "csv_data": row,
-                    "post_data": new2,
-                    "existing_data": mapped_existing_data,
-                    "name": name
-                })
-
-        return render_template('compare.html', comparison_data=comparison_data)
+        # One long-lived client per process; the token and config are reused across requests
+        device42_api = get_client(CONFIG_FILE)
+
+        try:
+            # Catch malformed files before comparing any of their rows against Device42
+            with open(file_path, 'r') as csv_file:
+                validation = device42_api.validate_csv(csv_file)
+            if not validation.ok:
+                for issue in validation.errors:
+                    flash(str(issue))
+                return redirect(request.url)
+
+            # Rows wait in the upload store for confirmation; the compare page reads them a page at a time
+            upload_store.purge(_compare_config().get('retention_hours', 24) * 3600)
+            with open(file_path, 'r', newline='') as csv_file:
+                upload_id = upload_store.create_upload(csv_file, secure_filename(file.filename))
+        finally:
+            os.remove(file_path)
+        return redirect(url_for('compare_upload', upload_id=upload_id))
 
     else:
         flash('Invalid file format. Only CSV files are allowed.')
         return redirect(request.url)
 
 
+def _compare_config():
+    return get_client(CONFIG_FILE).config.get('compare', {}) or {}
+
+
+def _page_bounds(upload, page, page_size):
+    """Return the page clamped to the upload, with its first and last row numbers."""
+    pages = max(1, -(-upload['total_rows'] // page_size))
+    page = min(max(page, 1), pages)
+    first_row = (page - 1) * page_size + 1
+    return page, pages, first_row, min(first_row + page_size - 1, upload['total_rows'])
+
+
+@app.route('/uploads/<upload_id>')
+def compare_upload(upload_id):
+    """Show one page of an upload next to the matching Device42 records."""
+    upload = upload_store.get_upload(upload_id)
+    if upload is None:
+        flash('Upload not found or expired')
+        return redirect(url_for('upload_form'))
+    page_size = _compare_config().get('page_size', 100)
+    page, pages, _, _ = _page_bounds(upload, request.args.get('page', 1, type=int), page_size)
+    rows = upload_store.page(upload, page, page_size)
+
+    device42_api = get_client(CONFIG_FILE)
+    # Object types in the local snapshot are compared offline; for larger files, page through each
+    # remaining object list once (cached across the upload's pages) instead of two lookups per row
+    index = {}
+    if upload['total_rows'] >= device42_api.prefetch_min_rows:
+        index = device42_api.cached_index({row.get('ObjectType') for _, row, _ in rows
+                                           if not device42_api.snapshot_covers(row.get('ObjectType'))})
+
+    # Query Device42 for each row on this page
+    comparison_data = []
+    for row_num, row, selected in rows:
+        name = row.get('Name')
+        obj_type = row.get('ObjectType')
+        existing_data = device42_api.check_existing(name, obj_type, index)
+        # Map existing_data to CSV field names based on csv_mappings
+        mapped_existing_data = {}
+        if existing_data:
+            for api_field, csv_field in device42_api.csv_mappings.items():
+                mapped_existing_data[csv_field] = existing_data['data'].get(api_field, 'N/A')
+
+        comparison_data.append({
+            "row_num": row_num,
+            "selected": selected,
+            "csv_data": row,
+            "existing_data": mapped_existing_data,
+            "name": name
+        })
+
+    return render_template('compare.html', upload=upload, page=page, pages=pages,
+                           comparison_data=comparison_data)
+
+
 @app.route('/confirm_upload', methods=['POST'])
 def confirm_upload():
-    device42_api = Device42API('/app/config.yaml')
-
-    # Iterate over selected checkboxes by row index
-    for row_index in request.form.getlist('selected_rows'):
-        # Access the hidden field corresponding to the row index
-        encoded_row_data = request.form.get(f'csv_data_{row_index}')
-        row_data = urllib.parse.unquote(encoded_row_data)
-        print(row_data)
-        try:
-            print("try")
-            # Decode JSON data for each selected row
-            csv_data = json.loads(row_data)
-            print("json")
-            device42_api.import_from_csv([csv_data])
-            print("import")
-        except json.JSONDecodeError as e:
-            print("except")
-            flash(f"Error decoding row {row_index}: {e}")
-            return redirect(url_for('upload_form'))
-
-    flash('Selected records uploaded successfully')
-    return redirect(url_for('upload_form'))
+    """Save the row selection of one compare page, then move to another page or start the import."""
+    upload = upload_store.get_upload(request.form.get('upload_id', ''))
+    if upload is None:
+        flash('Upload not found or expired')
+        return redirect(url_for('upload_form'))
+    page_size = _compare_config().get('page_size', 100)
+    page, _, first_row, last_row = _page_bounds(upload, request.form.get('page', 1, type=int), page_size)
+    upload_store.set_selected(upload['id'], first_row, last_row,
+                              [int(row_num) for row_num in request.form.getlist('selected_rows')
+                               if row_num.isdigit()])
+
+    action = request.form.get('action', 'upload')
+    if action in ('previous', 'next'):
+        return redirect(url_for('compare_upload', upload_id=upload['id'],
+                                page=page - 1 if action == 'previous' else page + 1))
+
+    rows = upload_store.rows(upload, selected_only=action != 'upload_all')
+    if not rows:
+        flash('No rows selected')
+        return redirect(url_for('compare_upload', upload_id=upload['id'], page=page))
+    # Import the selected rows in the background and show the job's progress
+    job_id = job_queue.submit_rows(rows)
+    upload_store.delete_upload(upload['id'])
+    return redirect(url_for('job_result', job_id=job_id))
+
+
+@app.route('/metrics')
+def metrics():
+    """Expose request latency, error/retry counts, phase times and throughput for Prometheus."""
+    # Uploads and background jobs share this client, so its metrics cover both
+    return Response(get_client(CONFIG_FILE).render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Return a job's status and progress counters as JSON."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Show a progress page while a job runs and its results once it has finished."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        flash('Job not found')
+        return redirect(url_for('upload_form'))
+    if job['status'] in (QUEUED, RUNNING):
+        return render_template('job_status.html', job=job)
+    return render_template('upload_result.html',
+                           job=job,
+                           imported=job_store.list_results(job_id, ['imported']),
+                           errors=job_store.list_results(job_id, ['failed', 'skipped']))
 
 
 if __name__ == "__main__":
@@ -1,8 +1,9 @@
-from flask import Flask, request, render_template, redirect, url_for, flash
+from flask import Flask, request, render_template, redirect, url_for, flash, jsonify, Response
 from werkzeug.utils import secure_filename
 import os
-import csv
-from device42_api import Device42API
+import uuid
+from device42_api import get_client
+from job_queue import JobQueue, JobStore, QUEUED, RUNNING
 
 # Initialize the Flask app
 app = Flask(__name__)
@@ -11,10 +12,18 @@ app = Flask(__name__)
 app.secret_key = 'your_secret_key'
 
 # Set the folder to store uploaded CSV files
-UPLOAD_FOLDER = '/app/uploads'
+UPLOAD_FOLDER = os.environ.get('DEVICE42_UPLOAD_FOLDER', '/app/uploads')
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
+# Update this line with the path to your config file
+CONFIG_FILE = os.environ.get('DEVICE42_CONFIG', '/app/config.yaml')
+
+# Imports run as background jobs so large files don't hold a request open
+job_store = JobStore(os.path.join(UPLOAD_FOLDER, 'jobs.sqlite3'))
+job_queue = JobQueue(job_store, CONFIG_FILE)
+job_queue.resume_unfinished()
+
 # Allow only CSV files for uploads
 ALLOWED_EXTENSIONS = {'csv'}
 
@@ -45,55 +54,60 @@ def upload_file():
 
     # Check if the file is allowed (CSV only)
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
+        # Prefix with a unique ID so concurrent uploads of the same file name don't collide
+        filename = f"{uuid.uuid4().hex}_{secure_filename(file.filename)}"
 
         # Save the file to the upload folder
         file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         file.save(file_path)
 
-        # Initialize the Device42 API and process the CSV file
+        # Queue the import and return straight away; the job validates the file before importing it,
+        # and progress or validation errors are on the job page
         try:
-            # Update this line with the path to your config file
-            device42_api = Device42API('/app/config.yaml')
-
-            # Variables to track results
-            imported_records = []
-            error_records = []
-
-            # Open the saved CSV file and process it
-            with open(file_path, 'r') as csv_file:
-                csv_reader = csv.DictReader(csv_file)
-                for row in csv_reader:
-                    name = row.get('Name', 'Unknown')
-                    object_type = row.get('ObjectType', 'Unknown')
-                    try:
-                        # Call the import function for each row
-                        device42_api.import_from_csv([row])  # Process each row individually
-                        imported_records.append({
-                            "name": name,
-                            "object_type": object_type
-                        })
-                    except Exception as e:
-                        error_records.append({
-                            "name": name,
-                            "object_type": object_type,
-                            "error": str(e)
-                        })
-
-            # Pass the results to the template to display
-            return render_template('upload_result.html',
-                                   imported=imported_records,
-                                   errors=error_records)
-
+            job_id = job_queue.submit_file(file_path)
         except Exception as e:
             flash(f'Error processing file: {str(e)}')
             return redirect(request.url)
+        return redirect(url_for('job_result', job_id=job_id))
 
     else:
         flash('Invalid file format. Only CSV files are allowed.')
         return redirect(request.url)
 
 
+@app.route('/metrics')
+def metrics():
+    """Expose request latency, error/retry counts, phase times and throughput for Prometheus."""
+    # Uploads and background jobs share this client, so its metrics cover both
+    return Response(get_client(CONFIG_FILE).render_metrics(), mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Return a job's status and progress counters as JSON."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    """Show a progress page while a job runs and its results once it has finished."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        flash('Job not found')
+        return redirect(url_for('upload_form'))
+    if job['status'] in (QUEUED, RUNNING):
+        return render_template('job_status.html', job=job)
+
+    # Pass the results to the template to display
+    return render_template('upload_result.html',
+                           job=job,
+                           imported=job_store.list_results(job_id, ['imported']),
+                           errors=job_store.list_results(job_id, ['failed', 'skipped']))
+
+
 # Run the Flask app
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5001)